@@ -44,13 +44,20 @@ from tools import (
     window_management,
     clipboard_operations,
     smart_automation_task,
+    get_pixel_color,
+    find_image_on_screen,
+    find_color_on_screen,
+    define_screen_region,
+    batch_input,
     # Voice interaction capabilities
     speak_text,
     listen_for_command,
     configure_voice,
     voice_conversation_mode,
     audio_system_control,
-    devin_wake_word_detection
+    devin_wake_word_detection,
+    # Shutdown hook for the tools' shared HTTP session
+    close_http_session
 )
 from advanced_tools import (
     image_analyzer,
@@ -128,6 +135,11 @@ class Assistant(Agent):
                 window_management,
                 clipboard_operations,
                 smart_automation_task,
+                get_pixel_color,
+                find_image_on_screen,
+                find_color_on_screen,
+                define_screen_region,
+                batch_input,
                 
                 # Voice interaction capabilities
                 speak_text,
@@ -142,6 +154,9 @@ class Assistant(Agent):
 
 
 async def entrypoint(ctx: agents.JobContext):
+    # The tools' pooled HTTP session lives on this job's loop; close it there
+    ctx.add_shutdown_callback(close_http_session)
+    
     session = AgentSession(
     )
 
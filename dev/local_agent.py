@@ -1,4 +1,5 @@
 import os
+import sys
 import asyncio
 from typing import List, Dict
 
@@ -25,7 +26,15 @@ async def run_demo():
 
 def main():
     os.environ.setdefault("OFFLINE_LLM", "1")
-    asyncio.run(run_demo())
+    try:
+        import uvloop  # Optional libuv-based event loop, not available on Windows
+    except ImportError:
+        uvloop = None
+
+    if uvloop is not None and sys.platform != "win32":
+        uvloop.run(run_demo())
+    else:
+        asyncio.run(run_demo())
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 import os
 import importlib
-from typing import Optional
+from typing import Iterable, Optional
 
 
 class OfflineSTT:
@@ -60,3 +60,27 @@ class OfflineSTT:
             except Exception:
                 text = ""
             return text or None
+
+    def recognize_stream(self, chunks: Iterable[bytes], sample_rate: int) -> Optional[str]:
+        """Transcribe 16-bit mono PCM chunks while they are still being captured.
+
+        Stops at the first endpoint Kaldi detects (trailing silence after
+        speech, or a long stretch with no speech at all), so the caller does
+        not have to wait for a complete recording before decoding starts.
+        """
+        if self._model is None:
+            self.initialize()
+
+        import json
+        rec = self._KaldiRecognizer(self._model, sample_rate)
+        for data in chunks:
+            if rec.AcceptWaveform(data):
+                result = rec.Result()
+                break
+        else:
+            result = rec.FinalResult()
+        try:
+            text = json.loads(result).get("text", "").strip()
+        except Exception:
+            text = ""
+        return text or None
@@ -3,6 +3,7 @@ DEVIN-like system interaction capabilities for Devin AI Assistant.
 Provides secure computer interaction with user permission controls.
 """
 import os
+import asyncio
 import subprocess
 import json
 import psutil
@@ -12,11 +13,35 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 import platform
+from itertools import islice
 from livekit.agents import function_tool, RunContext
 from gemini_client import get_gemini_client, gemini_tool
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Permission types that can be granted or revoked individually
+PERMISSION_OPERATIONS = (
+    "file_operations", "app_control", "system_control",
+    "network_operations", "automation", "auto_approve_safe"
+)
+VALID_OPERATIONS = frozenset(PERMISSION_OPERATIONS + ("all",))
+VALID_OPERATIONS_TEXT = ", ".join(PERMISSION_OPERATIONS + ("all",))
+
+# Personality modes accepted by voice_response_mode
+VOICE_RESPONSE_MODES = {
+    "formal": "Formal and professional responses with 'Sir' address",
+    "casual": "Relaxed and friendly conversational style",
+    "technical": "Detailed technical explanations and data",
+    "witty": "Clever and slightly sarcastic responses",
+    "classic_devin": "Classic Devin personality - intelligent, loyal, slightly humorous"
+}
+
 class PermissionManager:
     """Manages permissions for system operations."""
     
@@ -28,8 +53,8 @@ class PermissionManager:
         """Load permissions from file."""
         try:
             if os.path.exists(self.permissions_file):
-                with open(self.permissions_file, 'r') as f:
-                    self.permissions = json.load(f)
+                with open(self.permissions_file, 'rb') as f:
+                    self.permissions = _json_loads(f.read())
             else:
                 self.permissions = {
                     "file_operations": False,
@@ -73,16 +98,11 @@ async def grant_permission(operation: str, context: RunContext) -> str:
     Args:
         operation: Permission type ('file_operations', 'app_control', 'system_control', 'network_operations', 'automation', 'auto_approve_safe', 'all')
     """
-    valid_operations = [
-        "file_operations", "app_control", "system_control", 
-        "network_operations", "automation", "auto_approve_safe", "all"
-    ]
-    
-    if operation not in valid_operations:
-        return f"Invalid operation. Valid operations: {', '.join(valid_operations)}"
+    if operation not in VALID_OPERATIONS:
+        return f"Invalid operation. Valid operations: {VALID_OPERATIONS_TEXT}"
     
     if operation == "all":
-        for op in valid_operations[:-1]:  # Exclude 'all'
+        for op in PERMISSION_OPERATIONS:  # Exclude 'all'
             permission_manager.permissions[op] = True
         message = "✅ All system permissions granted to Devin."
     else:
@@ -100,16 +120,11 @@ async def revoke_permission(operation: str, context: RunContext) -> str:
     Args:
         operation: Permission type to revoke ('file_operations', 'app_control', 'system_control', 'network_operations', 'automation', 'auto_approve_safe', 'all')
     """
-    valid_operations = [
-        "file_operations", "app_control", "system_control", 
-        "network_operations", "automation", "auto_approve_safe", "all"
-    ]
-    
-    if operation not in valid_operations:
-        return f"Invalid operation. Valid operations: {', '.join(valid_operations)}"
+    if operation not in VALID_OPERATIONS:
+        return f"Invalid operation. Valid operations: {VALID_OPERATIONS_TEXT}"
     
     if operation == "all":
-        for op in valid_operations[:-1]:
+        for op in PERMISSION_OPERATIONS:
             permission_manager.permissions[op] = False
         message = "🔒 All system permissions revoked from Devin."
     else:
@@ -125,8 +140,8 @@ async def system_status_report(context: RunContext) -> str:
     Generate a comprehensive DEVIN-style system status report.
     """
     try:
-        # System information
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # System information (the 1s CPU sample runs off the event loop)
+        cpu_percent = await asyncio.to_thread(psutil.cpu_percent, 1)
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/' if platform.system() != 'Windows' else 'C:')
         boot_time = datetime.fromtimestamp(psutil.boot_time())
@@ -181,6 +196,15 @@ Status: All systems operational, Sir. Ready for your commands."""
     except Exception as e:
         return f"Error generating system report: {str(e)}"
 
+def _running_app_lines():
+    """Yield display lines for running processes, skipping ones that vanish."""
+    for proc in psutil.process_iter(['pid', 'name', 'status']):
+        try:
+            if proc.info['status'] == 'running':
+                yield f"- {proc.info['name']} (PID: {proc.info['pid']})"
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
 @function_tool
 async def control_applications(action: str, app_name: str, context: RunContext) -> str:
     """
@@ -200,16 +224,9 @@ async def control_applications(action: str, app_name: str, context: RunContext)
     
     try:
         if action == "list":
-            # List running applications
-            apps = []
-            for proc in psutil.process_iter(['pid', 'name', 'status']):
-                try:
-                    if proc.info['status'] == 'running':
-                        apps.append(f"- {proc.info['name']} (PID: {proc.info['pid']})")
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            return f"Running Applications:\n" + "\n".join(apps[:20])  # Limit to 20
+            # List running applications, stopping once the display limit is reached
+            apps = islice(_running_app_lines(), 20)
+            return f"Running Applications:\n" + "\n".join(apps)
         
         elif action == "launch":
             # Launch application
@@ -296,13 +313,14 @@ async def file_operations(operation: str, path: str, context: RunContext, conten
         
         elif operation == "list":
             if path_obj.is_dir():
+                # Only the first 20 entries are shown, so only those are stat'd
                 items = []
-                for item in path_obj.iterdir():
+                for item in islice(path_obj.iterdir(), 20):
                     icon = "📁" if item.is_dir() else "📄"
                     size = f" ({item.stat().st_size} bytes)" if item.is_file() else ""
                     items.append(f"{icon} {item.name}{size}")
                 
-                return f"📂 Contents of {path}:\n" + "\n".join(items[:20])
+                return f"📂 Contents of {path}:\n" + "\n".join(items)
             else:
                 return f"❌ {path} is not a directory."
         
@@ -512,21 +530,13 @@ async def voice_response_mode(mode: str, context: RunContext) -> str:
     Args:
         mode: Response mode ('formal', 'casual', 'technical', 'witty', 'classic_devin')
     """
-    modes = {
-        "formal": "Formal and professional responses with 'Sir' address",
-        "casual": "Relaxed and friendly conversational style", 
-        "technical": "Detailed technical explanations and data",
-        "witty": "Clever and slightly sarcastic responses",
-        "classic_devin": "Classic Devin personality - intelligent, loyal, slightly humorous"
-    }
-    
-    if mode not in modes:
-        return f"Available modes: {', '.join(modes.keys())}"
+    if mode not in VOICE_RESPONSE_MODES:
+        return f"Available modes: {', '.join(VOICE_RESPONSE_MODES)}"
     
     # Save preference to memory
     try:
         from memory_manager import memory_manager
         memory_manager.add_memory(f"Voice response mode set to: {mode}", memory_type="user_preference")
-        return f"✅ Voice response mode set to '{mode}': {modes[mode]}. I'll adjust my personality accordingly, Sir."
+        return f"✅ Voice response mode set to '{mode}': {VOICE_RESPONSE_MODES[mode]}. I'll adjust my personality accordingly, Sir."
     except:
         return f"✅ Voice response mode acknowledged: {mode}. Personality adjustment active."
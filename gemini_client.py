@@ -3,11 +3,15 @@ Enhanced Gemini API client with connection pooling and error handling.
 """
 import os
 import asyncio
+import hashlib
 import logging
-from typing import Optional, Dict, Any
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
 from dataclasses import dataclass
-from functools import wraps
+from functools import lru_cache, wraps
 import time
+from collections import OrderedDict, deque
 
 # Optional offline fallback
 OFFLINE = os.getenv("OFFLINE_LLM", "0").lower() in {"1", "true", "yes"}
@@ -20,13 +24,26 @@ if OFFLINE:
 
 logger = logging.getLogger(__name__)
 
+# Exact-match cache for text-only generations requested with cache=True
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 3600.0
+# Opt-in: with GEMINI_CACHE_DB set to a file path, cached responses are also
+# written to SQLite so they survive restarts. Off by default, since prompts
+# and answers would sit on disk in plaintext
+RESPONSE_CACHE_DB = os.getenv("GEMINI_CACHE_DB", "")
+RESPONSE_DISK_CACHE_TTL = 24 * 3600
+# Expired rows are deleted when the database opens and again at most this often
+RESPONSE_DISK_PRUNE_INTERVAL = 3600
+
 @dataclass
 class GeminiConfig:
     """Configuration for Gemini API client."""
     api_key: str
     model: str = "gemini-1.5-flash"
     max_retries: int = 3
-    timeout: int = 30
+    # Per-attempt limit; a slow attempt is abandoned and retried rather than
+    # left to hold up the caller
+    timeout: float = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "15"))
     rate_limit_requests_per_minute: int = 60
 
 class GeminiAPIError(Exception):
@@ -39,14 +56,27 @@ class GeminiClient:
     def __init__(self, config: GeminiConfig):
         self.config = config
         self._model = None
+        # Models bound to a fixed system instruction, keyed by that instruction
+        self._instructed_models: Dict[str, Any] = {}
         self._last_request_time = 0
         self._request_count = 0
-        self._request_times = []
+        # Bounded to one window's worth of requests; oldest entries fall off
+        self._request_times = deque(maxlen=max(1, config.rate_limit_requests_per_minute))
         self._offline = OFFLINE
         self._local_llm = None
+        # sha256(model, options, prompt) -> (stored_at, response)
+        self._response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.cache_stats = {"hits": 0, "misses": 0, "disk_hits": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._db_pruned_at = 0.0
         
     async def _ensure_model(self):
         """Lazy initialization of Gemini model."""
+        self._init_model()
+    
+    def _init_model(self):
+        """Create the model (or load the offline LLM) if not done yet."""
         if self._offline:
             if self._local_llm is None:
                 if load_config is None:
@@ -65,12 +95,39 @@ class GeminiClient:
                 except Exception as e:
                     raise GeminiAPIError(f"Failed to initialize Gemini model: {e}")
     
+    async def warm_up(self, *system_instructions: str):
+        """Import the SDK and build the models before the first request.
+        
+        A model is built for each of system_instructions, on one worker
+        thread so it can overlap other startup work; no request is sent, so
+        nothing is billed or counted against the limit.
+        """
+        def _build():
+            self._init_model()
+            if not self._offline:
+                for system_instruction in system_instructions:
+                    self._model_for(system_instruction)
+        
+        await asyncio.to_thread(_build)
+    
+    def _model_for(self, system_instruction: Optional[str]):
+        """Return a model that carries system_instruction, creating it once."""
+        if system_instruction is None:
+            return self._model
+        model = self._instructed_models.get(system_instruction)
+        if model is None:
+            import google.generativeai as genai
+            model = genai.GenerativeModel(self.config.model, system_instruction=system_instruction)
+            self._instructed_models[system_instruction] = model
+        return model
+    
     async def _rate_limit(self):
         """Implement rate limiting."""
         current_time = time.time()
         
         # Clean old request times (older than 1 minute)
-        self._request_times = [t for t in self._request_times if current_time - t < 60]
+        while self._request_times and current_time - self._request_times[0] >= 60:
+            self._request_times.popleft()
         
         # Check if we're within rate limits
         if len(self._request_times) >= self.config.rate_limit_requests_per_minute:
@@ -81,21 +138,137 @@ class GeminiClient:
         
         self._request_times.append(current_time)
     
+    @property
+    def retry_budget(self) -> float:
+        """Longest a request can spend in _retry_with_backoff: every attempt
+        timing out, plus the backoff sleeps between them."""
+        backoff = sum(2 ** attempt for attempt in range(self.config.max_retries - 1))
+        return self.config.max_retries * self.config.timeout + backoff
+    
     async def _retry_with_backoff(self, func, *args, **kwargs):
-        """Retry function with exponential backoff."""
+        """Retry function with exponential backoff, timing out each attempt."""
+        # Local inference runs in a thread that can't be cancelled, so a
+        # timeout there would only stack up more concurrent generations
+        timeout = None if self._offline else self.config.timeout
         for attempt in range(self.config.max_retries):
             try:
-                return await func(*args, **kwargs)
+                return await asyncio.wait_for(func(*args, **kwargs), timeout=timeout)
             except Exception as e:
+                reason = f"no response within {timeout:g}s" if isinstance(e, asyncio.TimeoutError) else e
                 if attempt == self.config.max_retries - 1:
-                    raise GeminiAPIError(f"Failed after {self.config.max_retries} attempts: {e}")
+                    raise GeminiAPIError(f"Failed after {self.config.max_retries} attempts: {reason}")
                 
                 wait_time = 2 ** attempt
-                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {wait_time}s...")
+                logger.warning(f"Attempt {attempt + 1} failed: {reason}. Retrying in {wait_time}s...")
                 await asyncio.sleep(wait_time)
     
-    async def generate_content(self, prompt: str, **kwargs) -> str:  
-        """Generate content with error handling and retries."""
+    def _cache_key(self, prompt: str, system_instruction: Optional[str], options: Dict[str, Any]) -> str:
+        """Hash everything that affects the generated text."""
+        raw = f"{self.config.model}\0{system_instruction}\0{sorted(options.items())!r}\0{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[str]:
+        entry = self._response_cache.get(key)
+        if entry is None or time.monotonic() - entry[0] >= RESPONSE_CACHE_TTL:
+            self.cache_stats["misses"] += 1
+            return None
+        self._response_cache.move_to_end(key)
+        self.cache_stats["hits"] += 1
+        return entry[1]
+    
+    def _cache_put(self, key: str, response: str):
+        self._response_cache[key] = (time.monotonic(), response)
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+    
+    def _disk_cache(self) -> Optional[sqlite3.Connection]:
+        """Open the answer cache database on first use (caller holds _db_lock)."""
+        if self._db is None and RESPONSE_CACHE_DB:
+            self._db = sqlite3.connect(RESPONSE_CACHE_DB, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "key TEXT PRIMARY KEY, prompt TEXT, response TEXT, "
+                "created_at INTEGER, hits INTEGER DEFAULT 0)"
+            )
+            self._prune_disk_cache()
+        return self._db
+    
+    def _prune_disk_cache(self):
+        """Delete rows past the disk TTL (caller holds _db_lock)."""
+        with self._db:
+            self._db.execute(
+                "DELETE FROM answer_cache WHERE created_at <= ?",
+                (int(time.time() - RESPONSE_DISK_CACHE_TTL),)
+            )
+        self._db_pruned_at = time.monotonic()
+    
+    def _disk_get(self, key: str) -> Optional[str]:
+        """Return a persisted response younger than the disk TTL, counting the hit."""
+        try:
+            with self._db_lock:
+                db = self._disk_cache()
+                if db is None:
+                    return None
+                row = db.execute(
+                    "SELECT response FROM answer_cache WHERE key = ? AND created_at > ?",
+                    (key, int(time.time() - RESPONSE_DISK_CACHE_TTL))
+                ).fetchone()
+                if row is None:
+                    return None
+                with db:
+                    db.execute("UPDATE answer_cache SET hits = hits + 1 WHERE key = ?", (key,))
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+    
+    def _disk_put(self, key: str, prompt: str, response: str):
+        try:
+            with self._db_lock:
+                db = self._disk_cache()
+                if db is None:
+                    return
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO answer_cache (key, prompt, response, created_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, prompt, response, int(time.time()))
+                    )
+                # Long-running sessions keep writing, so prune here as well
+                if time.monotonic() - self._db_pruned_at >= RESPONSE_DISK_PRUNE_INTERVAL:
+                    self._prune_disk_cache()
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed: {e}")
+    
+    async def generate_content(self, prompt: str, image_bytes: Optional[bytes] = None,
+                               mime_type: str = "image/jpeg", cache: bool = False,
+                               system_instruction: Optional[str] = None, **kwargs) -> str:  
+        """Generate content with error handling and retries.
+        
+        If image_bytes is given it is sent alongside the prompt as an inline
+        image part (ignored by the offline backend).
+        
+        A static system_instruction is bound to a reusable model rather than
+        prepended to every prompt, so only the prompt itself varies per call.
+        
+        With cache=True an identical text-only request made within the last
+        hour is answered from memory, or within the last day from the SQLite
+        answer cache when GEMINI_CACHE_DB enables it, skipping the rate
+        limiter and the API.
+        """
+        key = None
+        if cache and image_bytes is None:
+            key = self._cache_key(prompt, system_instruction, kwargs)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+            cached = await asyncio.to_thread(self._disk_get, key)
+            if cached is not None:
+                self.cache_stats["disk_hits"] += 1
+                self._cache_put(key, cached)
+                return cached
+        
         await self._ensure_model()
         await self._rate_limit()
         
@@ -103,39 +276,114 @@ class GeminiClient:
             try:
                 if self._offline:
                     messages = [
-                        {"role": "system", "content": "You are Devin, a capable local assistant. Be concise."},
+                        {"role": "system", "content": system_instruction or "You are Devin, a capable local assistant. Be concise."},
                         {"role": "user", "content": prompt},
                     ]
-                    text = self._local_llm.chat(messages, max_tokens=kwargs.get("max_output_tokens", 512))
+                    # Local inference is blocking; keep it off the event loop
+                    text = await asyncio.to_thread(
+                        self._local_llm.chat, messages, max_tokens=kwargs.get("max_output_tokens", 512)
+                    )
                     return text
                 else:
-                    response = self._model.generate_content(prompt, **kwargs)
+                    contents = prompt
+                    if image_bytes is not None:
+                        contents = [prompt, {"mime_type": mime_type, "data": image_bytes}]
+                    model = self._model_for(system_instruction)
+                    # The async variant lets concurrent callers overlap their requests
+                    response = await model.generate_content_async(contents, **kwargs)
                     return response.text
             except Exception as e:
                 logger.error(f"Gemini API error: {e}")
                 raise
         
-        return await self._retry_with_backoff(_generate)
-
-# Global Gemini client instance
-_gemini_client: Optional[GeminiClient] = None
+        response = await self._retry_with_backoff(_generate)
+        if key is not None:
+            self._cache_put(key, response)
+            await asyncio.to_thread(self._disk_put, key, prompt, response)
+        return response
+    
+    async def generate_content_stream(self, prompt: str, system_instruction: Optional[str] = None,
+                                      **kwargs) -> AsyncIterator[str]:
+        """Yield the response text chunk by chunk as the model produces it.
+        
+        The blocking stream is read on a worker thread and handed back to the
+        event loop, so callers can act on the first chunk while the rest is
+        still arriving. The offline backend yields its answer as one chunk.
+        Streams are neither retried nor cached.
+        
+        Raises GeminiAPIError if no chunk arrives within config.timeout.
+        Closing the generator early stops the reader after its current chunk
+        without waiting for the rest of the stream.
+        """
+        await self._ensure_model()
+        await self._rate_limit()
+        
+        if self._offline:
+            messages = [
+                {"role": "system", "content": system_instruction or "You are Devin, a capable local assistant. Be concise."},
+                {"role": "user", "content": prompt},
+            ]
+            yield await asyncio.to_thread(
+                self._local_llm.chat, messages, max_tokens=kwargs.get("max_output_tokens", 512)
+            )
+            return
+        
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        model = self._model_for(system_instruction)
+        # Set when the consumer goes away; the reader thread checks it between chunks
+        stop = threading.Event()
+        
+        def _put(item):
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError:
+                pass  # Loop already closed; the consumer left long ago
+        
+        def _produce():
+            try:
+                for chunk in model.generate_content(prompt, stream=True, **kwargs):
+                    if stop.is_set():
+                        return
+                    _put(chunk.text)
+            except Exception as e:
+                logger.error(f"Gemini API error: {e}")
+                _put(e)
+            finally:
+                _put(None)
+        
+        # Not awaited: the thread finishes on its own once it sees stop
+        loop.run_in_executor(None, _produce)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(chunks.get(), timeout=self.config.timeout)
+                except asyncio.TimeoutError:
+                    raise GeminiAPIError(f"Streaming generation stalled: no chunk within {self.config.timeout:g}s")
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise GeminiAPIError(f"Streaming generation failed: {item}")
+                yield item
+        finally:
+            stop.set()
 
+@lru_cache(maxsize=1)
 def get_gemini_client() -> GeminiClient:
-    """Get or create the global Gemini client."""
-    global _gemini_client
-    
-    if _gemini_client is None:
-        if OFFLINE:
-            # No API key required
-            config = GeminiConfig(api_key="offline", model="local")
-        else:
-            api_key = os.getenv('GOOGLE_API_KEY')
-            if not api_key:
-                raise GeminiAPIError("GOOGLE_API_KEY not found in environment variables")
-            config = GeminiConfig(api_key=api_key)
-        _gemini_client = GeminiClient(config)
+    """Get or create the global Gemini client.
     
-    return _gemini_client
+    Built once and shared; a missing API key raises without being cached,
+    so a later call can succeed once the key is set.
+    """
+    if OFFLINE:
+        # No API key required
+        config = GeminiConfig(api_key="offline", model="local")
+    else:
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise GeminiAPIError("GOOGLE_API_KEY not found in environment variables")
+        config = GeminiConfig(api_key=api_key)
+    return GeminiClient(config)
 
 def gemini_tool(func):
     """Decorator for tools that use Gemini API."""
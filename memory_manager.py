@@ -2,15 +2,25 @@
 Memory management for the Devin AI Assistant using mem0.
 """
 import os
+import sys
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Slotted instances drop the per-memory __dict__ (dataclass slots need 3.10+)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class Memory:
     """Represents a memory item."""
     content: str
@@ -36,6 +46,9 @@ class MemoryManager:
     def __init__(self, memory_dir: str = "memory"):
         self.memory_dir = memory_dir
         self.memories: List[Memory] = []
+        # Bumped whenever memories change; keys the cached summary
+        self._version = 0
+        self._summary_cache: Optional[Tuple[int, str]] = None
         self._ensure_memory_dir()
         self._load_memories()
     
@@ -48,8 +61,8 @@ class MemoryManager:
         try:
             memory_file = os.path.join(self.memory_dir, "memories.json")
             if os.path.exists(memory_file):
-                with open(memory_file, 'r') as f:
-                    data = json.load(f)
+                with open(memory_file, 'rb') as f:
+                    data = _json_loads(f.read())
                     self.memories = [Memory.from_dict(mem) for mem in data]
                 logger.info(f"Loaded {len(self.memories)} memories")
         except Exception as e:
@@ -74,8 +87,9 @@ class MemoryManager:
             metadata=metadata or {}
         )
         self.memories.append(memory)
+        self._version += 1
         self._save_memories()
-        logger.info(f"Added {memory_type} memory: {content[:50]}...")
+        logger.debug("Added %s memory: %.50s...", memory_type, content)
     
     def get_memories(self, memory_type: Optional[str] = None, limit: int = 10) -> List[Memory]:
         """Get recent memories, optionally filtered by type."""
@@ -115,11 +129,15 @@ class MemoryManager:
         removed_count = old_count - new_count
         
         if removed_count > 0:
+            self._version += 1
             self._save_memories()
             logger.info(f"Cleaned {removed_count} old memories")
     
     def get_memory_summary(self) -> str:
         """Get a summary of stored memories."""
+        if self._summary_cache and self._summary_cache[0] == self._version:
+            return self._summary_cache[1]
+        
         if not self.memories:
             return "No memories stored yet."
         
@@ -137,6 +155,7 @@ class MemoryManager:
         summary += f"Oldest memory: {oldest_memory.timestamp.strftime('%Y-%m-%d')}\n"
         summary += f"Newest memory: {newest_memory.timestamp.strftime('%Y-%m-%d')}"
         
+        self._summary_cache = (self._version, summary)
         return summary
 
 # Global memory manager instance
@@ -3,6 +3,7 @@ Simple decorator replacement for LiveKit's @function_tool
 Allows existing tools to work without LiveKit dependency
 """
 import functools
+import inspect
 from typing import Any, Callable, Optional
 
 class MockRunContext:
@@ -21,13 +22,30 @@ def function_tool(func: Callable) -> Callable:
     Replacement for LiveKit's @function_tool decorator.
     Allows existing tool functions to work without modification.
     """
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        # Inject mock context if needed
-        if 'context' in func.__code__.co_varnames and 'context' not in kwargs:
-            kwargs['context'] = mock_context
-        
-        return await func(*args, **kwargs)
+    # co_varnames also lists locals, so check the real parameters once up front
+    needs_context = 'context' in inspect.signature(func).parameters
+    
+    # Pick the wrapper once here rather than inspecting the result on every call;
+    # sync tools are still exposed as coroutines so callers can always await
+    if inspect.iscoroutinefunction(func) and not needs_context:
+        # Nothing to inject, so the tool itself is the fast path
+        wrapper = func
+    elif inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Inject mock context if needed
+            if 'context' not in kwargs:
+                kwargs['context'] = mock_context
+            
+            return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Inject mock context if needed
+            if needs_context and 'context' not in kwargs:
+                kwargs['context'] = mock_context
+            
+            return func(*args, **kwargs)
     
     # Add tool metadata
     wrapper.is_tool = True
@@ -1,16 +1,19 @@
 """
 Advanced screen interaction and computer vision capabilities for DEVIN-like functionality.
 """
+import asyncio
+import functools
 import cv2
+import mss
 import numpy as np
 import pyautogui
 import time
 import json
 import logging
-from typing import Dict, List, Optional, Tuple, Any
-from PIL import Image, ImageDraw, ImageFont
-import base64
-import io
+import os
+from typing import Callable, Dict, List, Optional, Tuple, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from livekit.agents import function_tool, RunContext
 from gemini_client import get_gemini_client, gemini_tool
 
@@ -20,31 +23,476 @@ logger = logging.getLogger(__name__)
 pyautogui.FAILSAFE = True
 pyautogui.PAUSE = 0.1
 
+# Template matching pyramid settings
+PYRAMID_LEVELS = 3
+PYRAMID_MIN_SIZE = 16  # Smallest template side allowed at the coarsest level
+PYRAMID_MARGIN = 4     # Refinement window padding (pixels) at each finer level
+
+# Screenshot encoding: JPEG by default, PNG/PPM as lossless opt-ins
+SCREENSHOT_FORMATS = ("jpg", "png", "ppm")
+JPEG_QUALITY = 85
+VISION_JPEG_QUALITY = 80  # Frames sent to Gemini as inline images
+
+# Duration of an animated (smooth) mouse move
+SMOOTH_MOVE_SECONDS = 0.5
+
+# Text longer than this is pasted through the clipboard instead of typed per key
+PASTE_THRESHOLD = 32
+# How long the target app gets to read the clipboard before it is restored;
+# raise it for apps that read the clipboard lazily and paste the old contents
+PASTE_SETTLE_SECONDS = float(os.getenv("PASTE_SETTLE_SECONDS", "0.2"))
+
+# Named keyboard shortcuts, pre-split into key sequences
+_SHORTCUTS: Dict[str, Tuple[str, ...]] = {
+    "copy": ("ctrl", "c"),
+    "paste": ("ctrl", "v"),
+    "cut": ("ctrl", "x"),
+    "undo": ("ctrl", "z"),
+    "redo": ("ctrl", "y"),
+    "select_all": ("ctrl", "a"),
+    "save": ("ctrl", "s"),
+    "find": ("ctrl", "f"),
+    "new_tab": ("ctrl", "t"),
+    "close_tab": ("ctrl", "w"),
+    "switch_window": ("alt", "tab"),
+}
+_HOTKEY_CACHE: Dict[str, Tuple[str, ...]] = {}
+
+def _parse_hotkey(combination: str) -> Tuple[str, ...]:
+    """Split a 'ctrl+shift+s' style combination into keys, memoized per string."""
+    keys = _HOTKEY_CACHE.get(combination)
+    if keys is None:
+        keys = tuple(k.strip() for k in combination.split('+'))
+        _HOTKEY_CACHE[combination] = keys
+    return keys
+
+# Event types accepted by batch_input -> fields each one must carry
+INPUT_EVENT_TYPES = {
+    "move": ("x", "y"),
+    "click": (),
+    "right_click": (),
+    "double_click": (),
+    "scroll": ("amount",),
+    "type": ("text",),
+    "press": ("key",),
+    "hotkey": ("keys",),
+}
+# Types of the fields an event may carry, required or optional
+INPUT_FIELD_TYPES = {
+    "x": int,
+    "y": int,
+    "amount": int,
+    "text": str,
+    "key": str,
+    "keys": str,
+    "interval": (int, float),
+}
+
+def _dispatch_input_event(event: Dict[str, Any]):
+    """Send one mouse or keyboard event described by a batch_input entry."""
+    kind = event["type"]
+    if kind == "move":
+        pyautogui.moveTo(event["x"], event["y"], duration=0)
+    elif kind == "click":
+        pyautogui.click(event.get("x"), event.get("y"))
+    elif kind == "right_click":
+        pyautogui.rightClick(event.get("x"), event.get("y"))
+    elif kind == "double_click":
+        pyautogui.doubleClick(event.get("x"), event.get("y"))
+    elif kind == "scroll":
+        pyautogui.scroll(event["amount"])
+    elif kind == "type":
+        pyautogui.typewrite(event["text"], interval=event.get("interval", 0.0))
+    elif kind == "press":
+        pyautogui.press(event["key"])
+    elif kind == "hotkey":
+        pyautogui.hotkey(*_parse_hotkey(event["keys"]))
+
+# Regions covering more than this share of the screen are sliced from a full frame
+REGION_SLICE_RATIO = 0.5
+FRAME_REUSE_SECONDS = 0.05  # Full frames this recent are reused instead of re-grabbed
+
+# Clipboard polling after sending Ctrl+C
+COPY_WAIT_SECONDS = 0.5
+COPY_POLL_SECONDS = 0.01
+
+# Window enumeration results are shared by tool calls within this window
+WINDOW_CACHE_TTL = 0.25
+
+def _build_pyramid(image: np.ndarray, levels: int) -> List[np.ndarray]:
+    """Build a Gaussian pyramid with the full-resolution image first."""
+    pyramid = [image]
+    for _ in range(levels - 1):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+@functools.lru_cache(maxsize=None)
+def _adaptive_threshold_kernel() -> Optional[Callable]:
+    """Compile the numba adaptive threshold kernel on first use.
+    
+    numba is optional and slow to import, so it is only loaded when OCR
+    preprocessing actually runs. Returns None if numba is not installed.
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    
+    @numba.njit(parallel=True)
+    def kernel(gray, integral, block, C, out):
+        """Mean adaptive threshold over a block x block window, parallel over rows."""
+        height, width = gray.shape
+        radius = block // 2
+        for y in numba.prange(height):
+            y0 = max(y - radius, 0)
+            y1 = min(y + radius + 1, height)
+            for x in range(width):
+                x0 = max(x - radius, 0)
+                x1 = min(x + radius + 1, width)
+                total = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+                mean = total / ((y1 - y0) * (x1 - x0))
+                out[y, x] = 255 if gray[y, x] > mean - C else 0
+    
+    return kernel
+
+def _binarize_adaptive(frame_gray: np.ndarray, block: int = 31, C: int = 10) -> np.ndarray:
+    """Binarize a grayscale frame for OCR using a local mean threshold.
+    
+    Uses the numba kernel when numba is installed, otherwise OpenCV's
+    equivalent adaptiveThreshold.
+    """
+    kernel = _adaptive_threshold_kernel()
+    if kernel is None:
+        return cv2.adaptiveThreshold(frame_gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block, C)
+    
+    out = np.empty_like(frame_gray)
+    kernel(frame_gray, cv2.integral(frame_gray, sdepth=cv2.CV_64F), block, C, out)
+    return out
+
+class ScreenManager:
+    """Manages screen capture and template matching for screen tools."""
+    
+    def __init__(self):
+        # Template pyramids by path, in "color" (BGRA) and "gray" forms
+        self._templates: Dict[str, Dict[str, List[np.ndarray]]] = {}
+        
+        # Long-lived capture handle and frame buffer, reused by every grab
+        self._sct = mss.mss()
+        self._monitor = self._sct.monitors[1]
+        self._frame = np.empty((self._monitor["height"], self._monitor["width"], 4), dtype=np.uint8)
+        self._frame_time = 0.0
+        
+        # Encoding and disk writes run here so they never block the event loop
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="screen-io")
+        
+        # Named capture closures with their region bounds baked in
+        self._capturers: Dict[str, Callable[[], np.ndarray]] = {}
+        
+        # (timestamp, snapshot) from the last window enumeration
+        self._win_cache: Tuple[float, Optional[Dict[str, List[Any]]]] = (0.0, None)
+    
+    def _grab_ndarray(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        """Grab the screen (or an (x, y, width, height) region) as a BGRA array.
+        
+        The array is a zero-copy view over the raw mss capture buffer.
+        """
+        if region is None:
+            monitor = self._monitor
+        else:
+            x, y, width, height = region
+            monitor = {"left": x, "top": y, "width": width, "height": height}
+        sct_img = self._sct.grab(monitor)
+        
+        return np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+    
+    def region_capturer(self, name: str, bbox: Tuple[int, int, int, int]) -> Callable[[], np.ndarray]:
+        """Build and register a capture function specialized for one screen region.
+        
+        The monitor descriptor and grab method are bound once, so each call is
+        just a grab and a numpy view. The closure's `origin` attribute holds the
+        region's top-left screen coordinates.
+        """
+        x, y, width, height = bbox
+        monitor = {"left": x, "top": y, "width": width, "height": height}
+        grab = self._sct.grab
+        
+        def capture_region() -> np.ndarray:
+            sct_img = grab(monitor)
+            return np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(height, width, 4)
+        
+        capture_region.__name__ = f"capture_{name}"
+        capture_region.origin = (x, y)
+        self._capturers[name] = capture_region
+        return capture_region
+    
+    def get_capturer(self, name: str) -> Optional[Callable[[], np.ndarray]]:
+        """Return a previously registered region capturer, or None."""
+        return self._capturers.get(name)
+    
+    def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        """Capture the screen (or an (x, y, width, height) region) as a BGRA array.
+        
+        Region coordinates are absolute desktop coordinates. Full-screen grabs
+        go into the preallocated frame buffer and are reused for
+        FRAME_REUSE_SECONDS. Large regions lying within the primary monitor
+        are sliced out of that frame, while small ones (or ones reaching
+        past the monitor) are grabbed directly.
+        """
+        if region is not None:
+            x, y, width, height = region
+            # The frame starts at the monitor's origin, which need not be (0, 0)
+            left, top = x - self._monitor["left"], y - self._monitor["top"]
+            frame_height, frame_width = self._frame.shape[:2]
+            inside = (left >= 0 and top >= 0 and width > 0 and height > 0
+                      and left + width <= frame_width and top + height <= frame_height)
+            if not inside or width * height <= REGION_SLICE_RATIO * frame_width * frame_height:
+                return self._grab_ndarray(region)
+        
+        now = time.monotonic()
+        if now - self._frame_time >= FRAME_REUSE_SECONDS:
+            arr = self._grab_ndarray()
+            if arr.shape != self._frame.shape:
+                # Screen resolution changed since the buffer was allocated
+                self._frame = np.empty_like(arr)
+            np.copyto(self._frame, arr)
+            self._frame_time = now
+        
+        if region is None:
+            return self._frame
+        return self._frame[top:top + height, left:left + width]
+    
+    def save_frame(self, path: str, frame: np.ndarray) -> "Future[bool]":
+        """Encode a BGRA frame to disk in the background.
+        
+        The encoder is chosen from the file extension. The frame is converted
+        to a private BGR copy before returning, so the caller's buffer can be
+        reused immediately.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if ext in (".jpg", ".jpeg") else []
+        bgr = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        return self._io_pool.submit(cv2.imwrite, path, bgr, params)
+    
+    def encode_frame(self, frame: np.ndarray, quality: int = JPEG_QUALITY) -> bytes:
+        """Encode a BGRA frame as JPEG bytes in memory."""
+        ok, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("Failed to encode frame as JPEG")
+        return buffer.tobytes()
+    
+    def _load_template(self, template_path: str, color: bool = False) -> List[np.ndarray]:
+        """Load a template image pyramid (BGRA or grayscale), caching both forms by path."""
+        forms = self._templates.get(template_path)
+        if forms is None:
+            image = cv2.imread(template_path, cv2.IMREAD_COLOR)
+            if image is None:
+                raise FileNotFoundError(f"Template image not found: {template_path}")
+            
+            # Only downsample while the template stays large enough to match reliably
+            levels = 1
+            while levels < PYRAMID_LEVELS and min(image.shape[:2]) >> levels >= PYRAMID_MIN_SIZE:
+                levels += 1
+            
+            forms = {
+                "color": _build_pyramid(cv2.cvtColor(image, cv2.COLOR_BGR2BGRA), levels),
+                "gray": _build_pyramid(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), levels),
+            }
+            self._templates[template_path] = forms
+        return forms["color" if color else "gray"]
+    
+    def get_pixel_color(self, x: int, y: int) -> Tuple[int, int, int]:
+        """Return the (r, g, b) color of the pixel at (x, y).
+        
+        Only a 1x1 region is grabbed, so this is a 4-byte copy rather than a
+        full-screen capture.
+        """
+        sct_img = self._sct.grab({"left": x, "top": y, "width": 1, "height": 1})
+        b, g, r = sct_img.raw[:3]  # mss raw data is BGRA
+        return r, g, b
+    
+    def _snapshot_windows(self) -> Dict[str, List[Any]]:
+        """Read every window's properties once into parallel lists."""
+        import pygetwindow as gw
+        
+        handles = gw.getAllWindows()
+        titles = [w.title for w in handles]
+        return {
+            "handles": handles,
+            "titles": titles,
+            "titles_lower": [t.lower() for t in titles],
+            "sizes": [(w.width, w.height) for w in handles],
+        }
+    
+    def windows(self) -> Dict[str, List[Any]]:
+        """Return a window snapshot (handles, titles, titles_lower, sizes), cached briefly.
+        
+        Raises ImportError if pygetwindow is not installed.
+        """
+        now = time.monotonic()
+        if self._win_cache[1] is not None and now - self._win_cache[0] < WINDOW_CACHE_TTL:
+            return self._win_cache[1]
+        
+        snapshot = self._snapshot_windows()
+        self._win_cache = (now, snapshot)
+        return snapshot
+    
+    def invalidate_windows(self):
+        """Drop the cached window list after a change to the window set."""
+        self._win_cache = (0.0, None)
+    
+    def find_color(self, rgb: Tuple[int, int, int], tolerance: int = 10) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """Find on-screen pixels within a tolerance of an (r, g, b) color.
+        
+        Returns the number of matching pixels and the (x, y) centroid of the
+        matches, or None for the centroid when nothing matches.
+        """
+        r, g, b = rgb
+        lower = np.clip(np.array([b, g, r, 0]) - tolerance, 0, 255).astype(np.uint8)
+        upper = np.clip(np.array([b, g, r, 255]) + tolerance, 0, 255).astype(np.uint8)
+        
+        # Alpha bounds span 0-255, so the BGRA frame is matched without a copy
+        mask = cv2.inRange(self._grab_ndarray(), lower, upper)
+        count = cv2.countNonZero(mask)
+        if not count:
+            return 0, None
+        
+        moments = cv2.moments(mask, binaryImage=True)
+        return count, (int(moments["m10"] / moments["m00"]), int(moments["m01"] / moments["m00"]))
+    
+    async def find_text(self, text: str, region: str = "") -> Optional[Tuple[int, int]]:
+        """Locate text on screen with OCR.
+        
+        If region names a registered capturer, only that region is searched.
+        Returns the (x, y) screen center of the first matching run of words,
+        or None. Raises ImportError if pytesseract is not installed, and
+        pytesseract.TesseractNotFoundError if the Tesseract binary is missing.
+        """
+        import pytesseract
+        
+        capturer = self._capturers.get(region) if region else None
+        if capturer is not None:
+            frame = capturer()
+            offset_x, offset_y = capturer.origin
+        else:
+            frame = self._grab_ndarray()
+            offset_x, offset_y = 0, 0
+        
+        def ocr() -> Dict[str, List[Any]]:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+            return pytesseract.image_to_data(_binarize_adaptive(gray), output_type=pytesseract.Output.DICT)
+        
+        # Full-screen OCR (and the first-call numba compile) takes seconds;
+        # the grab above stays on the caller's thread with the mss handle
+        data = await asyncio.to_thread(ocr)
+        
+        # Keep word-level entries only
+        indices = [i for i, word in enumerate(data["text"]) if word.strip()]
+        words = [data["text"][i].lower() for i in indices]
+        target = text.lower().split()
+        
+        for start in range(len(words) - len(target) + 1):
+            if target and words[start:start + len(target)] == target:
+                matched = indices[start:start + len(target)]
+                left = min(data["left"][i] for i in matched)
+                top = min(data["top"][i] for i in matched)
+                right = max(data["left"][i] + data["width"][i] for i in matched)
+                bottom = max(data["top"][i] + data["height"][i] for i in matched)
+                return offset_x + (left + right) // 2, offset_y + (top + bottom) // 2
+        
+        return None
+    
+    def find_image(self, template_path: str, confidence: float = 0.8,
+                   color: bool = False) -> Optional[Tuple[int, int, float]]:
+        """Locate a template image on screen.
+        
+        Matching runs on grayscale unless color is set, which moves a quarter
+        of the bytes of BGRA matching. It starts on the coarsest pyramid level,
+        then refines the best candidate in a small window at each finer level.
+        Returns the (x, y) center of the match and its score, or None if the
+        final score is below the confidence threshold.
+        """
+        template_pyramid = self._load_template(template_path, color)
+        screen = self._grab_ndarray()
+        if not color:
+            screen = cv2.cvtColor(screen, cv2.COLOR_BGRA2GRAY)
+        screen_pyramid = _build_pyramid(screen, len(template_pyramid))
+        
+        top = len(template_pyramid) - 1
+        result = cv2.matchTemplate(screen_pyramid[top], template_pyramid[top], cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+        
+        for level in range(top - 1, -1, -1):
+            screen = screen_pyramid[level]
+            template = template_pyramid[level]
+            height, width = template.shape[:2]
+            
+            # Search a small window around the upsampled candidate
+            x0 = max(x * 2 - PYRAMID_MARGIN, 0)
+            y0 = max(y * 2 - PYRAMID_MARGIN, 0)
+            x1 = min(x * 2 + width + PYRAMID_MARGIN, screen.shape[1])
+            y1 = min(y * 2 + height + PYRAMID_MARGIN, screen.shape[0])
+            
+            result = cv2.matchTemplate(screen[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, (dx, dy) = cv2.minMaxLoc(result)
+            x, y = x0 + dx, y0 + dy
+        
+        if max_val < confidence:
+            return None
+        
+        height, width = template_pyramid[0].shape[:2]
+        return x + width // 2, y + height // 2, max_val
+
+@functools.lru_cache(maxsize=1)
+def get_screen_manager() -> ScreenManager:
+    """Return the shared screen manager, creating it on first use.
+    
+    Construction opens an mss capture handle, allocates a full-frame buffer
+    and starts an IO thread pool, so importing this module does none of that.
+    """
+    return ScreenManager()
+
 @function_tool
-async def take_screenshot(context: RunContext, save_path: str = "") -> str:
+async def take_screenshot(context: RunContext, save_path: str = "", fmt: str = "jpg", region: str = "") -> str:
     """
     Take a screenshot of the current screen.
     
     Args:
         save_path: Optional path to save the screenshot
+        fmt: Image format for the default path ('jpg', 'png', 'ppm')
+        region: Optional area to capture as "x,y,width,height"
     """
+    if fmt not in SCREENSHOT_FORMATS:
+        return f"❌ Invalid format. Available: {', '.join(SCREENSHOT_FORMATS)}"
+    
+    bbox = None
+    if region:
+        try:
+            bbox = tuple(int(v) for v in region.split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            return "❌ Invalid region. Use the format: x,y,width,height"
+    
     try:
         # Take screenshot
-        screenshot = pyautogui.screenshot()
+        manager = get_screen_manager()
+        frame = manager.capture(bbox)
         
         if save_path:
-            screenshot.save(save_path)
+            if not await asyncio.wrap_future(manager.save_frame(save_path, frame)):
+                return f"Error taking screenshot: could not write {save_path}"
             return f"📸 Screenshot saved to: {save_path}"
         else:
             # Save to default location with timestamp
             from datetime import datetime
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_path = f"screenshot_{timestamp}.png"
-            screenshot.save(default_path)
+            default_path = f"screenshot_{timestamp}.{fmt}"
+            if not await asyncio.wrap_future(manager.save_frame(default_path, frame)):
+                return f"Error taking screenshot: could not write {default_path}"
             return f"📸 Screenshot captured and saved as: {default_path}"
             
     except Exception as e:
-        logger.error(f"Screenshot error: {e}")
+        logger.error("Screenshot error: %s", e)
         return f"Error taking screenshot: {str(e)}"
 
 @function_tool
@@ -57,13 +505,9 @@ async def analyze_screen(context: RunContext, task_description: str = "Analyze w
         task_description: What to look for or analyze on screen
     """
     try:
-        # Take screenshot
-        screenshot = pyautogui.screenshot()
-        
-        # Convert to base64 for AI analysis
-        img_buffer = io.BytesIO()
-        screenshot.save(img_buffer, format='PNG')
-        img_str = base64.b64encode(img_buffer.getvalue()).decode()
+        # Take screenshot and encode it for AI analysis
+        manager = get_screen_manager()
+        image_bytes = manager.encode_frame(manager.capture(), quality=VISION_JPEG_QUALITY)
         
         client = get_gemini_client()
         
@@ -81,17 +525,16 @@ Please describe:
 
 Be specific and actionable in your analysis, Sir."""
         
-        # Note: This would need the vision-capable Gemini model
-        response = await client.generate_content(prompt)
+        response = await client.generate_content(prompt, image_bytes=image_bytes)
         
         return f"👁️ DEVIN Screen Analysis:\n{response}"
         
     except Exception as e:
-        logger.error(f"Screen analysis error: {e}")
+        logger.error("Screen analysis error: %s", e)
         return f"Error analyzing screen: {str(e)}"
 
 @function_tool
-async def mouse_control(action: str, x: int = 0, y: int = 0, context: RunContext = None) -> str:
+async def mouse_control(action: str, x: int = 0, y: int = 0, smooth: bool = False, context: RunContext = None) -> str:
     """
     Control mouse movements and clicks.
     
@@ -99,6 +542,7 @@ async def mouse_control(action: str, x: int = 0, y: int = 0, context: RunContext
         action: Mouse action ('move', 'click', 'right_click', 'double_click', 'scroll_up', 'scroll_down', 'position')
         x: X coordinate (for move and click actions)
         y: Y coordinate (for move and click actions)
+        smooth: Animate the move instead of jumping directly to the target
     """
     from devin_system import permission_manager
     
@@ -116,7 +560,12 @@ async def mouse_control(action: str, x: int = 0, y: int = 0, context: RunContext
             return f"🖱️ Current mouse position: ({current_pos.x}, {current_pos.y})"
         
         elif action == "move":
-            pyautogui.moveTo(x, y, duration=0.5)
+            if smooth:
+                # The eased move sleeps between steps, so keep it off the event loop
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, lambda: pyautogui.moveTo(x, y, duration=SMOOTH_MOVE_SECONDS))
+            else:
+                pyautogui.moveTo(x, y, duration=0)
             return f"🖱️ Mouse moved to ({x}, {y})"
         
         elif action == "click":
@@ -155,17 +604,21 @@ async def mouse_control(action: str, x: int = 0, y: int = 0, context: RunContext
             return "❌ Invalid action. Available: move, click, right_click, double_click, scroll_up, scroll_down, position"
             
     except Exception as e:
-        logger.error(f"Mouse control error: {e}")
+        logger.error("Mouse control error: %s", e)
         return f"Error controlling mouse: {str(e)}"
 
 @function_tool
-async def keyboard_control(action: str, text: str = "", context: RunContext = None) -> str:
+async def keyboard_control(action: str, text: str = "", interval: float = 0.0, context: RunContext = None) -> str:
     """
     Control keyboard input and hotkeys.
     
+    Text longer than 32 characters is pasted via the clipboard in one event,
+    which is much faster but loses per-character timing.
+    
     Args:
-        action: Keyboard action ('type', 'hotkey', 'press', 'key_combination')
-        text: Text to type or key combination
+        action: Keyboard action ('type', 'hotkey', 'press', 'key_combination', 'shortcut')
+        text: Text to type, key combination, or shortcut name (e.g. 'copy', 'undo')
+        interval: Delay between keystrokes when typing character by character
     """
     from devin_system import permission_manager
     
@@ -179,7 +632,23 @@ async def keyboard_control(action: str, text: str = "", context: RunContext = No
     
     try:
         if action == "type":
-            pyautogui.typewrite(text, interval=0.05)
+            if len(text) > PASTE_THRESHOLD:
+                try:
+                    import pyperclip
+                    
+                    previous = pyperclip.paste()
+                    pyperclip.copy(text)
+                    try:
+                        pyautogui.hotkey('ctrl', 'v')
+                        await asyncio.sleep(PASTE_SETTLE_SECONDS)
+                    finally:
+                        # Put the user's clipboard back even if the paste failed
+                        pyperclip.copy(previous)
+                    return f"⌨️ Typed: {text}"
+                except ImportError:
+                    pass  # Fall back to per-key typing
+            
+            pyautogui.typewrite(text, interval=interval)
             return f"⌨️ Typed: {text}"
         
         elif action == "press":
@@ -187,29 +656,103 @@ async def keyboard_control(action: str, text: str = "", context: RunContext = No
             return f"⌨️ Pressed key: {text}"
         
         elif action == "hotkey" or action == "key_combination":
-            keys = text.split('+')
-            pyautogui.hotkey(*keys)
+            pyautogui.hotkey(*_parse_hotkey(text))
             return f"⌨️ Executed hotkey: {text}"
         
+        elif action == "shortcut":
+            keys = _SHORTCUTS.get(text)
+            if keys is None:
+                return f"❌ Unknown shortcut. Available: {', '.join(_SHORTCUTS)}"
+            pyautogui.hotkey(*keys)
+            return f"⌨️ Executed shortcut: {text}"
+        
         else:
-            return "❌ Invalid action. Available: type, press, hotkey, key_combination"
+            return "❌ Invalid action. Available: type, press, hotkey, key_combination, shortcut"
             
     except Exception as e:
-        logger.error(f"Keyboard control error: {e}")
+        logger.error("Keyboard control error: %s", e)
         return f"Error controlling keyboard: {str(e)}"
 
 @function_tool
-async def find_on_screen(image_description: str, context: RunContext, confidence: float = 0.8) -> str:
+async def batch_input(events_json: str, context: RunContext = None) -> str:
+    """
+    Run a sequence of mouse and keyboard events in one batch.
+    
+    Args:
+        events_json: JSON list of events, e.g. [{"type": "move", "x": 100, "y": 200},
+            {"type": "click"}, {"type": "type", "text": "hello"}, {"type": "hotkey", "keys": "ctrl+s"}].
+            Types: move, click, right_click, double_click, scroll (amount), type (text), press (key), hotkey (keys)
+    """
+    from devin_system import permission_manager
+    
+    permission_check = permission_manager.request_permission(
+        "system_control", 
+        "Batch input events"
+    )
+    
+    if permission_check != "granted":
+        return permission_check
+    
+    try:
+        events = json.loads(events_json)
+    except json.JSONDecodeError as e:
+        return f"❌ Invalid events JSON: {str(e)}"
+    
+    if not isinstance(events, list):
+        return "❌ Events must be a JSON list"
+    
+    # Validate everything up front so a bad entry never leaves a half-run batch
+    for i, event in enumerate(events):
+        if not isinstance(event, dict) or not isinstance(event.get("type"), str) \
+                or event["type"] not in INPUT_EVENT_TYPES:
+            return f"❌ Invalid event at position {i}. Available types: {', '.join(INPUT_EVENT_TYPES)}"
+        missing = [field for field in INPUT_EVENT_TYPES[event["type"]] if field not in event]
+        if missing:
+            return f"❌ Event at position {i} ({event['type']}) is missing: {', '.join(missing)}"
+        # Clicks take both coordinates or neither (click in place)
+        if ("x" in event) != ("y" in event):
+            return f"❌ Event at position {i} ({event['type']}) needs both x and y"
+        for field, expected in INPUT_FIELD_TYPES.items():
+            value = event.get(field)
+            # bool is an int subclass, but never a valid coordinate or amount
+            if field in event and (isinstance(value, bool) or not isinstance(value, expected)):
+                return f"❌ Event at position {i} ({event['type']}) has an invalid {field}: {value!r}"
+    
+    def run_batch():
+        for event in events:
+            _dispatch_input_event(event)
+    
+    try:
+        # One executor hop for the whole batch instead of one tool call per event
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, run_batch)
+        return f"🎛️ Executed {len(events)} input events"
+        
+    except Exception as e:
+        logger.error("Batch input error: %s", e)
+        return f"Error executing input events: {str(e)}"
+
+@function_tool
+async def find_on_screen(image_description: str, context: RunContext, confidence: float = 0.8, region: str = "") -> str:
     """
     Find specific elements on screen using image recognition.
     
     Args:
         image_description: Description of what to find on screen
         confidence: Confidence level for image matching (0.0 to 1.0)
+        region: Optional name of a region registered with define_screen_region
     """
+    if region and get_screen_manager().get_capturer(region) is None:
+        return f"❌ Unknown screen region: {region}. Define it with define_screen_region first."
+    
     try:
-        # Take screenshot for analysis
-        screenshot = pyautogui.screenshot()
+        # Look for the description as on-screen text first
+        try:
+            center = await get_screen_manager().find_text(image_description, region)
+            if center is not None:
+                return f"🔍 Found '{image_description}' on screen at ({center[0]}, {center[1]})"
+        except (ImportError, EnvironmentError):
+            pass  # OCR requires pytesseract and the Tesseract binary
         
         # For now, we'll use a simpler approach - analyzing the screenshot with AI
         # In a full implementation, you'd use template matching or object detection
@@ -225,9 +768,91 @@ Note: This feature requires advanced computer vision models for precise element
 Consider using 'analyze_screen' for general screen analysis or 'mouse_control' with specific coordinates."""
         
     except Exception as e:
-        logger.error(f"Screen search error: {e}")
+        logger.error("Screen search error: %s", e)
         return f"Error finding element on screen: {str(e)}"
 
+@function_tool
+async def define_screen_region(name: str, x: int, y: int, width: int, height: int, context: RunContext) -> str:
+    """
+    Register a named screen region for repeated, faster capture and search.
+    
+    Args:
+        name: Name for the region (e.g. 'taskbar', 'terminal')
+        x: Left edge of the region
+        y: Top edge of the region
+        width: Width of the region
+        height: Height of the region
+    """
+    if width <= 0 or height <= 0:
+        return "❌ Region width and height must be positive"
+    
+    get_screen_manager().region_capturer(name, (x, y, width, height))
+    return f"📐 Screen region '{name}' defined at ({x}, {y}) size {width}x{height}"
+
+@function_tool
+async def get_pixel_color(x: int, y: int, context: RunContext) -> str:
+    """
+    Get the color of a pixel on screen.
+    
+    Args:
+        x: X coordinate of the pixel
+        y: Y coordinate of the pixel
+    """
+    try:
+        r, g, b = get_screen_manager().get_pixel_color(x, y)
+        return f"🎨 Pixel at ({x}, {y}): RGB({r}, {g}, {b}) #{r:02x}{g:02x}{b:02x}"
+        
+    except Exception as e:
+        logger.error("Pixel color error: %s", e)
+        return f"Error reading pixel color: {str(e)}"
+
+@function_tool
+async def find_image_on_screen(template_path: str, context: RunContext, confidence: float = 0.8,
+                               color: bool = False) -> str:
+    """
+    Find an image on screen by matching it against a template file.
+    
+    Args:
+        template_path: Path to the template image to look for
+        confidence: Minimum match score (0.0 to 1.0)
+        color: Match in full color instead of grayscale (slower; use when hue matters)
+    """
+    try:
+        match = get_screen_manager().find_image(template_path, confidence, color)
+        
+        if match is None:
+            return f"❌ Image not found on screen: {template_path}"
+        
+        x, y, score = match
+        return f"🔍 Found {template_path} at ({x}, {y}) with confidence {score:.2f}"
+        
+    except Exception as e:
+        logger.error("Image search error: %s", e)
+        return f"Error finding image on screen: {str(e)}"
+
+@function_tool
+async def find_color_on_screen(r: int, g: int, b: int, context: RunContext, tolerance: int = 10) -> str:
+    """
+    Find where a color appears on screen.
+    
+    Args:
+        r: Red component (0-255)
+        g: Green component (0-255)
+        b: Blue component (0-255)
+        tolerance: Allowed difference per color channel
+    """
+    try:
+        count, center = get_screen_manager().find_color((r, g, b), tolerance)
+        
+        if center is None:
+            return f"❌ Color RGB({r}, {g}, {b}) not found on screen"
+        
+        return f"🎨 Found {count} pixels matching RGB({r}, {g}, {b}), centered at ({center[0]}, {center[1]})"
+        
+    except Exception as e:
+        logger.error("Color search error: %s", e)
+        return f"Error finding color on screen: {str(e)}"
+
 @function_tool
 async def window_management(action: str, window_title: str = "", context: RunContext = None) -> str:
     """
@@ -248,43 +873,42 @@ async def window_management(action: str, window_title: str = "", context: RunCon
         return permission_check
     
     try:
-        import pygetwindow as gw
+        snapshot = get_screen_manager().windows()
+        titles = snapshot["titles"]
         
         if action == "list":
-            windows = gw.getAllWindows()
-            window_list = []
-            for window in windows:
-                if window.title.strip():  # Only show windows with titles
-                    window_list.append(f"- {window.title} ({window.width}x{window.height})")
+            window_list = (
+                f"- {title} ({width}x{height})"
+                for title, (width, height) in zip(titles, snapshot["sizes"])
+                if title.strip()  # Only show windows with titles
+            )
             
-            return f"🪟 Open Windows:\n" + "\n".join(window_list[:15])  # Limit to 15 windows
+            return f"🪟 Open Windows:\n" + "\n".join(islice(window_list, 15))  # Limit to 15 windows
         
         elif action in ["focus", "minimize", "maximize", "close"]:
-            # Find window by title
-            windows = gw.getWindowsWithTitle(window_title)
-            
-            if not windows:
-                # Try partial match
-                all_windows = gw.getAllWindows()
-                windows = [w for w in all_windows if window_title.lower() in w.title.lower()]
+            # Find window by partial, case-insensitive title
+            query = window_title.lower()
+            index = next((i for i, title in enumerate(snapshot["titles_lower"]) if query in title), None)
             
-            if not windows:
+            if index is None:
                 return f"❌ Window not found: {window_title}"
             
-            window = windows[0]  # Use first match
+            window = snapshot["handles"][index]  # Use first match
+            title = titles[index]
             
             if action == "focus":
                 window.activate()
-                return f"🪟 Focused window: {window.title}"
+                return f"🪟 Focused window: {title}"
             elif action == "minimize":
                 window.minimize()
-                return f"🪟 Minimized window: {window.title}"
+                return f"🪟 Minimized window: {title}"
             elif action == "maximize":
                 window.maximize()
-                return f"🪟 Maximized window: {window.title}"
+                return f"🪟 Maximized window: {title}"
             elif action == "close":
                 window.close()
-                return f"🪟 Closed window: {window.title}"
+                get_screen_manager().invalidate_windows()
+                return f"🪟 Closed window: {title}"
         
         else:
             return "❌ Invalid action. Available: list, focus, minimize, maximize, close"
@@ -292,7 +916,7 @@ async def window_management(action: str, window_title: str = "", context: RunCon
     except ImportError:
         return "❌ Window management requires 'pygetwindow' package. Install with: pip install pygetwindow"
     except Exception as e:
-        logger.error(f"Window management error: {e}")
+        logger.error("Window management error: %s", e)
         return f"Error managing windows: {str(e)}"
 
 @function_tool
@@ -301,7 +925,7 @@ async def clipboard_operations(action: str, content: str = "", context: RunConte
     Manage clipboard operations (copy, paste, get content).
     
     Args:
-        action: Clipboard action ('copy', 'paste', 'get', 'clear')
+        action: Clipboard action ('copy', 'copy_selection', 'paste', 'get', 'clear')
         content: Content to copy to clipboard
     """
     try:
@@ -311,6 +935,21 @@ async def clipboard_operations(action: str, content: str = "", context: RunConte
             pyperclip.copy(content)
             return f"📋 Copied to clipboard: {content[:100]}{'...' if len(content) > 100 else ''}"
         
+        elif action == "copy_selection":
+            # Copy the current selection, returning as soon as the clipboard changes
+            before = pyperclip.paste()
+            pyautogui.hotkey('ctrl', 'c')
+            
+            copied = before
+            deadline = time.monotonic() + COPY_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                copied = pyperclip.paste()
+                if copied != before:
+                    break
+                await asyncio.sleep(COPY_POLL_SECONDS)
+            
+            return f"📋 Copied selection: {copied[:100]}{'...' if len(copied) > 100 else ''}"
+        
         elif action == "paste":
             pyautogui.hotkey('ctrl', 'v')
             return "📋 Pasted clipboard content"
@@ -324,12 +963,12 @@ async def clipboard_operations(action: str, content: str = "", context: RunConte
             return "📋 Clipboard cleared"
         
         else:
-            return "❌ Invalid action. Available: copy, paste, get, clear"
+            return "❌ Invalid action. Available: copy, copy_selection, paste, get, clear"
             
     except ImportError:
         return "❌ Clipboard operations require 'pyperclip' package. Install with: pip install pyperclip"
     except Exception as e:
-        logger.error(f"Clipboard error: {e}")
+        logger.error("Clipboard error: %s", e)
         return f"Error with clipboard operation: {str(e)}"
 
 @function_tool
@@ -353,11 +992,17 @@ async def smart_automation_task(task: str, context: RunContext) -> str:
     
     client = get_gemini_client()
     
+    # Send the current screen so the plan can reference what is visible
+    manager = get_screen_manager()
+    image_bytes = manager.encode_frame(manager.capture(), quality=VISION_JPEG_QUALITY)
+    
     # Analyze the task and create step-by-step automation
     prompt = f"""As Devin, analyze this automation task and provide specific steps to execute it:
 
 Task: {task}
 
+The attached image is the current screen.
+
 Break this down into specific actions using available tools:
 1. Screen analysis (if needed)
 2. Mouse movements and clicks
@@ -368,7 +1013,7 @@ Break this down into specific actions using available tools:
 Provide a detailed execution plan with specific coordinates, keys, and commands.
 Consider the user's safety and system security."""
     
-    response = await client.generate_content(prompt)
+    response = await client.generate_content(prompt, image_bytes=image_bytes)
     
     return f"""🤖 DEVIN Automation Analysis:
 
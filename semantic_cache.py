@@ -0,0 +1,88 @@
+"""
+Embedding-based response cache: a command that means the same as one answered
+recently ("capture my screen" / "take a screenshot") reuses that answer.
+"""
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sentence encoder and the cosine similarity a match must reach
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = 1024
+SEMANTIC_CACHE_TTL = 3600.0
+
+@lru_cache(maxsize=1)
+def _load_encoder():
+    """Load the sentence encoder once per process, or return None if unavailable."""
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(SEMANTIC_CACHE_MODEL)
+    except ImportError:
+        logger.info("sentence-transformers not installed; semantic cache disabled")
+    except Exception as e:
+        logger.warning(f"Could not load {SEMANTIC_CACHE_MODEL}; semantic cache disabled: {e}")
+    return None
+
+class SemanticCache:
+    """Nearest-neighbour lookup over normalized command embeddings."""
+    
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # One row per entry; rows are unit length so a dot product is the cosine
+        self._vectors: Optional[np.ndarray] = None
+        self._stored_at: List[float] = []
+        self._responses: List[Any] = []
+        self._lock = threading.Lock()
+    
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Encode text, or return None if sentence-transformers is unavailable.
+        
+        Blocking (the first call in the process also loads the model, which
+        every cache shares); run it off the event loop.
+        """
+        encoder = _load_encoder()
+        if encoder is None:
+            return None
+        return encoder.encode(text, normalize_embeddings=True).astype(np.float32)
+    
+    def match(self, vector: Optional[np.ndarray]) -> Optional[Any]:
+        """Return the stored response closest to vector, if unexpired and similar enough."""
+        if vector is None:
+            return None
+        with self._lock:
+            if self._vectors is None:
+                return None
+            sims = self._vectors @ vector
+            expired = np.asarray(self._stored_at) < time.monotonic() - self.ttl
+            sims[expired] = -1.0
+            best = int(sims.argmax())
+            if sims[best] >= self.threshold:
+                return self._responses[best]
+        return None
+    
+    def add(self, vector: Optional[np.ndarray], response: Any):
+        """Remember response for vector, dropping the oldest entry when full."""
+        if vector is None:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = vector[np.newaxis, :]
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._stored_at.append(time.monotonic())
+            self._responses.append(response)
+            if len(self._responses) > self.max_entries:
+                self._vectors = self._vectors[1:]
+                del self._stored_at[0]
+                del self._responses[0]
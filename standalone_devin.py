@@ -3,139 +3,446 @@ Standalone Devin AI Assistant - No LiveKit Required
 A complete desktop AI assistant with voice, screen control, and system automation.
 """
 import asyncio
-import logging
-from typing import Optional, Dict, Any
 import json
+import logging
+import re
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
 
-# Import your existing modules (they'll work without LiveKit)
-from devin_system import (
-    grant_permission, revoke_permission, system_status_report,
-    control_applications, file_operations, system_control,
-    intelligent_automation, network_diagnostics
-)
-from screen_interaction import (
-    take_screenshot, analyze_screen, mouse_control, keyboard_control,
-    find_on_screen, window_management, clipboard_operations
-)
-from voice_interaction import (
-    speak_text, listen_for_command, configure_voice,
-    voice_conversation_mode, audio_system_control
-)
+# Tool modules (TTS engine, microphone calibration, screen capture) and the
+# semantic cache (numpy, sentence encoder) are imported where they are first
+# used so the mode menu comes up immediately
 from gemini_client import get_gemini_client
 
 logger = logging.getLogger(__name__)
 
+# Markdown, emoji and other symbols the TTS engine would read out literally
+_SPEECH_RE = re.compile(r"[^A-Za-z0-9 .,!?':;\-]+")
+_SPACE_RE = re.compile(r"\s{2,}")
+# Whole commands that map straight onto a local action, answered without a
+# Gemini round-trip; each names the StandaloneDevin method that handles it.
+# App names are capped at three words so longer requests still go to Gemini
+_APP_NAME = r"(?P<app>[\w\-]+(?:\.[\w\-]+)*(?:\s+[\w\-]+(?:\.[\w\-]+)*){0,2})"
+_INTENT_PATTERNS = (
+    (re.compile(r"(?:please\s+)?(?:take|grab|capture)\s+(?:a\s+)?screenshot\W*", re.I), "_intent_screenshot"),
+    (re.compile(r"(?:please\s+)?(?:open|launch)\s+" + _APP_NAME + r"\W*", re.I), "_intent_launch"),
+    (re.compile(r"(?:please\s+)?close\s+" + _APP_NAME + r"\W*", re.I), "_intent_close"),
+    (re.compile(r"what(?:'s| is) the time\W*|what time is it\W*", re.I), "_intent_time"),
+    (re.compile(r"(?:show\s+)?system status(?:\s+report)?\W*", re.I), "_intent_status"),
+)
+
+# Local actions Gemini may pick in text mode, sharing the intent handlers:
+# function name -> (handler, whether it takes an app name)
+_FUNCTIONS = {
+    "screenshot": ("_intent_screenshot", False),
+    "launch": ("_intent_launch", True),
+    "close": ("_intent_close", True),
+    "time": ("_intent_time", False),
+    "status": ("_intent_status", False),
+}
+
+# Headroom over the client's own retry budget (every attempt timing out plus
+# the backoff between them) for rate limiting and model setup; the outer bound
+# only catches a backend that stalls outside the client's per-attempt timeout
+GENERATE_TIMEOUT_SLACK = 5.0
+
+# Text-mode commands are queued and answered by a small worker pool, so the
+# next command can be typed while earlier ones are still with Gemini
+COMMAND_WORKERS = 4
+COMMAND_QUEUE_SIZE = 32
+# Text-mode replies waiting to be read aloud; past this the oldest is dropped
+SPEECH_BACKLOG = 4
+
+# Menu choice -> run() mode; anything unrecognised means auto
+_MODES = {"1": "auto", "2": "text", "3": "voice"}
+
+# Sentence boundaries in streamed responses; each sentence is spoken as it completes
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+# Whole inputs that end text mode
+_QUIT_WORDS = frozenset({"quit", "exit", "bye", "goodbye", "stop"})
+# "devin quit" ends voice mode; word boundaries keep "quite" from matching
+_QUIT_RE = re.compile(r"\bquit\b", re.IGNORECASE)
+
+# Exact-match response cache for repeated commands
+RESPONSE_CACHE_SIZE = 128
+RESPONSE_CACHE_TTL = 30.0
+# Commands mentioning these words can give a different answer each time
+_VOLATILE_WORDS = frozenset({"time", "date", "random", "now", "screenshot"})
+
+# Static routing instructions, sent as the system instruction so every request
+# shares the same prefix and only the trailing command varies
+ANALYSIS_INSTRUCTION = """As Devin, analyze the user's command and determine the best action.
+
+Available capabilities:
+- System control (files, applications, processes)
+- Screen interaction (screenshots, mouse, keyboard)
+- Voice interaction (speech synthesis, recognition)
+- Web search and information lookup
+- Automation tasks
+- Window management
+- Audio control
+- Clipboard operations
+
+Respond with:
+1. What action should be taken
+2. Which function to call
+3. Any parameters needed
+
+Be helpful and direct like Devin would be."""
+
+# Text-mode variant: Gemini answers in JSON, naming a local function to run
+# when the command is one, so no free text has to be parsed afterwards
+ROUTING_INSTRUCTION = """As Devin, handle the user's command.
+
+If the command asks for one of these actions, set "function" to its name:
+- "screenshot": take a screenshot
+- "launch": open an application (put its name in "app")
+- "close": close an application (put its name in "app")
+- "time": tell the current date and time
+- "status": report on system status
+Otherwise set "function" to "none".
+
+Always put a short reply in "reply". Be helpful and direct like Devin would be."""
+
+ROUTING_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "reply": {"type": "string"},
+            "function": {"type": "string", "format": "enum", "enum": ["none", *_FUNCTIONS]},
+            "app": {"type": "string"},
+        },
+        "required": ["reply", "function"],
+    },
+}
+
+def setup_logging():
+    """Setup logging for the assistant."""
+    # Unbuffered: this is an interactive CLI, so records must show as they happen
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+# Configured once per process, not per StandaloneDevin instance
+setup_logging()
+
+@lru_cache(maxsize=64)
+def sanitize_for_speech(text: str) -> str:
+    """Strip a response down to characters worth speaking."""
+    return _SPACE_RE.sub(" ", _SPEECH_RE.sub(" ", text)).strip()
+
 class StandaloneDevin:
     """Standalone Devin AI Assistant without LiveKit dependency."""
     
     def __init__(self):
         self.running = False
         self.gemini_client = get_gemini_client()
+        # Never cut off a retry the client is still entitled to make
+        self.generate_timeout = self.gemini_client.retry_budget + GENERATE_TIMEOUT_SLACK
         self.voice_enabled = True
-        self.setup_logging()
-    
-    def setup_logging(self):
-        """Setup logging for the assistant."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        # Text mode caches routed JSON answers and voice mode free-text
+        # analyses; each has its own caches so neither is served for the other
+        self._response_cache: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._semantic_caches: Dict[str, Any] = {}  # Created on first cacheable command
+        # Gemini requests in flight, by cache key, shared by identical commands
+        self._inflight: Dict[str, asyncio.Task] = {}
     
     async def initialize(self):
         """Initialize Devin systems."""
         print("🤖 DEVIN STANDALONE ASSISTANT")
         print("=" * 50)
         
-        # Initialize voice system
-        try:
-            await speak_text("Devin systems initializing...", context=None)
-            print("✅ Voice system ready")
-        except Exception as e:
-            print(f"❌ Voice system error: {e}")
+        from devin_system import system_status_report
+        from voice_interaction import speak_text
+        
+        # Voice, system checks and model setup are independent, so run them concurrently
+        voice_result, status_result, model_result = await asyncio.gather(
+            speak_text("Devin systems initializing...", context=None),
+            system_status_report(context=None),
+            # Text mode routes with one instruction and voice mode streams
+            # with the other; auto mode can use both, so both are built
+            self.gemini_client.warm_up(ROUTING_INSTRUCTION, ANALYSIS_INSTRUCTION),
+            return_exceptions=True
+        )
+        
+        if isinstance(voice_result, Exception):
+            print(f"❌ Voice system error: {voice_result}")
             self.voice_enabled = False
+        else:
+            print("✅ Voice system ready")
         
-        # Check system permissions
-        try:
-            status = await system_status_report(context=None)
+        if isinstance(status_result, Exception):
+            print(f"❌ System interface error: {status_result}")
+        else:
             print("✅ System interface ready")
-        except Exception as e:
-            print(f"❌ System interface error: {e}")
+        
+        if isinstance(model_result, Exception):
+            print(f"❌ AI model error: {model_result}")
+        else:
+            print("✅ AI model ready")
         
         print("\n🎯 Devin is online and ready to assist!")
         return True
     
+    async def _route_intent(self, command: str) -> Optional[str]:
+        """Run the local handler for a recognised command, or return None."""
+        command = command.strip()
+        for pattern, handler in _INTENT_PATTERNS:
+            match = pattern.fullmatch(command)
+            if match:
+                return await getattr(self, handler)(**match.groupdict())
+        return None
+    
+    async def _intent_screenshot(self) -> str:
+        from screen_interaction import take_screenshot
+        return await take_screenshot(context=None)
+    
+    async def _intent_launch(self, app: str) -> str:
+        from devin_system import control_applications
+        return await control_applications("launch", app, context=None)
+    
+    async def _intent_close(self, app: str) -> str:
+        from devin_system import control_applications
+        return await control_applications("close", app, context=None)
+    
+    async def _intent_time(self) -> str:
+        return f"Current date and time: {datetime.now():%Y-%m-%d %H:%M:%S}"
+    
+    async def _intent_status(self) -> str:
+        from devin_system import system_status_report
+        return await system_status_report(context=None)
+    
+    async def _act_on(self, answer: Dict[str, str]) -> str:
+        """Run the local function an answer names, if any, and return the text to show."""
+        reply = answer.get("reply", "")
+        handler, takes_app = _FUNCTIONS.get(answer.get("function"), (None, False))
+        app = answer.get("app", "").strip()
+        if handler is None or (takes_app and not app):
+            return reply
+        result = await getattr(self, handler)(**({"app": app} if takes_app else {}))
+        return f"{reply}\n{result}" if reply else result
+    
+    async def _cached_response(self, command: str, path: str) -> Tuple[str, Any, bool, Optional[Dict[str, str]]]:
+        """Return (cache key, embedding, whether cacheable, cached answer or None).
+        
+        path names the instruction the answer comes from ("routing" or
+        "analysis"); only answers produced the same way are returned.
+        """
+        key = " ".join(command.lower().split())
+        cacheable = _VOLATILE_WORDS.isdisjoint(re.findall(r"[a-z]+", key))
+        if not cacheable:
+            return key, None, False, None
+        
+        cached = self._response_cache.get((path, key))
+        if cached and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+            self._response_cache.move_to_end((path, key))
+            return key, None, True, cached[1]
+        
+        # Different wording of something already answered
+        semantic = self._semantic_caches.get(path)
+        if semantic is None:
+            from semantic_cache import SemanticCache
+            semantic = self._semantic_caches[path] = SemanticCache()
+        vector = await asyncio.to_thread(semantic.embed, key)
+        return key, vector, True, semantic.match(vector)
+    
+    def _store_response(self, path: str, key: str, vector: Any, response: Dict[str, str]):
+        self._response_cache[(path, key)] = (time.monotonic(), response)
+        self._response_cache.move_to_end((path, key))
+        if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+        # Similar wording is not the same request ("close spotify" sits right
+        # next to "open spotify"), so answers that run a local action are only
+        # ever replayed for the exact command that produced them
+        semantic = self._semantic_caches.get(path)
+        if semantic is not None and response.get("function", "none") == "none":
+            semantic.add(vector, response)
+    
+    async def _generate(self, key: str, vector: Any, command: str, cacheable: bool) -> Dict[str, str]:
+        """Ask Gemini about a command and cache the parsed answer."""
+        # Use Gemini to understand and route the command; the fixed
+        # instructions lead, so the command is the only varying part
+        analysis_prompt = f"Command: {command}"
+        
+        # Same prompt, same answer: let the client serve repeats from its
+        # hour-long response cache once this short-lived one has expired
+        response = await asyncio.wait_for(
+            self.gemini_client.generate_content(
+                analysis_prompt, cache=cacheable, system_instruction=ROUTING_INSTRUCTION,
+                generation_config=ROUTING_CONFIG
+            ),
+            timeout=self.generate_timeout
+        )
+        
+        # The offline backend ignores the schema; treat plain text as the reply
+        try:
+            answer = json.loads(response)
+        except ValueError:
+            answer = None
+        if not isinstance(answer, dict) or "reply" not in answer:
+            answer = {"reply": response, "function": "none"}
+        
+        if cacheable:
+            self._store_response("routing", key, vector, answer)
+        return answer
+    
     async def process_command(self, command: str) -> str:
         """Process a user command and return response."""
         try:
-            # Use Gemini to understand and route the command
-            analysis_prompt = f"""
-            As Devin, analyze this command and determine the best action:
-            
-            Command: {command}
-            
-            Available capabilities:
-            - System control (files, applications, processes)
-            - Screen interaction (screenshots, mouse, keyboard)
-            - Voice interaction (speech synthesis, recognition)
-            - Web search and information lookup
-            - Automation tasks
-            - Window management
-            - Audio control
-            - Clipboard operations
+            routed = await self._route_intent(command)
+        except Exception as e:
+            logger.error("Command processing error: %s", e)
+            return f"Sorry, I encountered an error: {str(e)}"
+        if routed is not None:
+            return f"Devin: {routed}"
+        
+        key, vector, cacheable, cached = await self._cached_response(command, "routing")
+        
+        try:
+            if cached is not None:
+                return f"Devin: {await self._act_on(cached)}"
             
-            Respond with:
-            1. What action should be taken
-            2. Which function to call
-            3. Any parameters needed
+            # A command typed again while its first request is still out
+            # waits for that answer instead of sending a second request
+            task = self._inflight.get(key) if cacheable else None
+            if task is None:
+                task = asyncio.ensure_future(self._generate(key, vector, command, cacheable))
+                if cacheable:
+                    self._inflight[key] = task
+                    task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            answer = await asyncio.shield(task)
+            return f"Devin: {await self._act_on(answer)}"
             
-            Be helpful and direct like Devin would be.
-            """
+        except asyncio.TimeoutError:
+            logger.error("Command processing timed out after %.0fs", self.generate_timeout)
+            return "Sorry, that took too long to answer. Please try again."
+        except Exception as e:
+            logger.error("Command processing error: %s", e)
+            return f"Sorry, I encountered an error: {str(e)}"
+    
+    async def process_command_stream(self, command: str) -> AsyncIterator[str]:
+        """Process a user command, yielding the response a sentence at a time."""
+        try:
+            routed = await self._route_intent(command)
+        except Exception as e:
+            logger.error("Command processing error: %s", e)
+            yield f"Sorry, I encountered an error: {str(e)}"
+            return
+        if routed is not None:
+            yield routed
+            return
+        
+        key, vector, cacheable, cached = await self._cached_response(command, "analysis")
+        
+        try:
+            if cached is not None:
+                yield await self._act_on(cached)
+                return
             
-            response = await self.gemini_client.generate_content(analysis_prompt)
+            parts = []
+            pending = ""
+            async for chunk in self.gemini_client.generate_content_stream(
+                f"Command: {command}", system_instruction=ANALYSIS_INSTRUCTION
+            ):
+                parts.append(chunk)
+                # Release every completed sentence; keep the unfinished tail
+                *sentences, pending = _SENTENCE_SPLIT_RE.split(pending + chunk)
+                for sentence in sentences:
+                    yield sentence
             
-            # For now, return the AI analysis
-            # In a full implementation, you'd parse this and call appropriate functions
-            return f"Devin: {response}"
+            if pending.strip():
+                yield pending
+            if cacheable:
+                self._store_response("analysis", key, vector, {"reply": "".join(parts), "function": "none"})
             
         except Exception as e:
-            logger.error(f"Command processing error: {e}")
-            return f"Sorry, I encountered an error: {str(e)}"
+            logger.error("Command processing error: %s", e)
+            yield f"Sorry, I encountered an error: {str(e)}"
     
-    async def text_mode(self):
-        """Run in text-only mode."""
-        print("\n💬 TEXT MODE - Type 'quit' to exit")
-        print("=" * 40)
-        
-        while self.running:
+    async def _command_worker(self, commands: asyncio.Queue, speech: asyncio.Queue):
+        """Answer queued text-mode commands until cancelled."""
+        while True:
+            user_input = await commands.get()
             try:
-                user_input = input("\nYou: ").strip()
-                
-                if user_input.lower() in ['quit', 'exit', 'bye']:
-                    break
-                
-                if not user_input:
-                    continue
-                
                 # Process the command
                 response = await self.process_command(user_input)
                 print(f"\n{response}")
                 
-                # Optionally speak the response
+                # Optionally speak the response, without waiting for it
                 if self.voice_enabled:
-                    try:
-                        await speak_text(response, context=None)
-                    except:
-                        pass  # Continue even if voice fails
-                        
-            except KeyboardInterrupt:
-                break
+                    if speech.full():
+                        speech.get_nowait()  # Typing outpaced speech; skip the stalest reply
+                    speech.put_nowait(response)
             except Exception as e:
                 print(f"Error: {e}")
+            finally:
+                commands.task_done()
+    
+    async def _speech_worker(self, speech: asyncio.Queue):
+        """Read text-mode replies aloud one at a time until cancelled."""
+        from voice_interaction import speak_text
+        speak = partial(speak_text, context=None, async_speak=False)
+        while True:
+            response = await speech.get()
+            try:
+                await speak(sanitize_for_speech(response))
+            except Exception:
+                pass  # Continue even if voice fails
+    
+    async def text_mode(self):
+        """Run in text-only mode."""
+        print("\n💬 TEXT MODE - Type 'quit' to exit")
+        print("=" * 40)
+        
+        commands: asyncio.Queue = asyncio.Queue(maxsize=COMMAND_QUEUE_SIZE)
+        speech: asyncio.Queue = asyncio.Queue(maxsize=SPEECH_BACKLOG)
+        workers = [asyncio.create_task(self._command_worker(commands, speech)) for _ in range(COMMAND_WORKERS)]
+        if self.voice_enabled:
+            workers.append(asyncio.create_task(self._speech_worker(speech)))
+        
+        try:
+            while self.running:
+                try:
+                    # Read on a worker thread so the event loop keeps running while the user types
+                    user_input = (await asyncio.to_thread(input, "\nYou: ")).strip()
+                    
+                    if user_input.casefold() in _QUIT_WORDS:
+                        break
+                    
+                    if not user_input:
+                        continue
+                    
+                    # Hand off and go straight back to reading input
+                    await commands.put(user_input)
+                    
+                except (KeyboardInterrupt, EOFError):
+                    break
+                except Exception as e:
+                    print(f"Error: {e}")
+            
+            # Answer whatever was typed before quitting
+            await commands.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
         
         print("\n👋 Goodbye! Devin systems shutting down.")
     
     async def voice_mode(self):
         """Run in voice interaction mode."""
+        from voice_interaction import speak_text, listen_for_command, voice_manager
+        
+        # Bound once for the loop below; these tools never need a real context here
+        speak = partial(speak_text, context=None, async_speak=True)
+        listen = partial(listen_for_command, context=None)
+        
         print("\n🎤 VOICE MODE - Say 'devin quit' to exit")
         print("=" * 40)
         
@@ -143,19 +450,24 @@ class StandaloneDevin:
             try:
                 # Listen for voice command
                 print("\n🎧 Listening...")
-                command = await listen_for_command(context=None)
+                command = await listen()
                 
-                if not command or "quit" in command.lower():
+                if not command or _QUIT_RE.search(command):
                     break
                 
                 print(f"You said: {command}")
                 
-                # Process the command
-                response = await self.process_command(command)
-                print(f"Devin: {response}")
-                
-                # Speak the response
-                await speak_text(response, context=None)
+                # Stream the answer, queueing each sentence for the TTS worker
+                # as soon as it is complete, so speech starts on the first one
+                # while Gemini is still generating the rest. Listening is
+                # half-duplex: the next listen() waits for queued speech to
+                # finish, since without echo cancellation the microphone would
+                # transcribe Devin's own voice
+                print("Devin:", end="", flush=True)
+                async for sentence in self.process_command_stream(command):
+                    print(f" {sentence}", end="", flush=True)
+                    await speak(sanitize_for_speech(sentence))
+                print()
                 
             except KeyboardInterrupt:
                 break
@@ -165,6 +477,9 @@ class StandaloneDevin:
                 print("Switching to text mode...")
                 await self.text_mode()
                 break
+        
+        # Let the last queued response finish instead of cutting it off
+        await asyncio.to_thread(voice_manager.wait_until_idle)
     
     async def run(self, mode="auto"):
         """Run the Devin assistant."""
@@ -200,18 +515,20 @@ async def main():
     print("3. Voice only")
     
     try:
-        choice = input("Enter choice (1-3, default=1): ").strip()
-        
-        if choice == "2":
-            await devin.run("text")
-        elif choice == "3":
-            await devin.run("voice")
-        else:
-            await devin.run("auto")
+        choice = (await asyncio.to_thread(input, "Enter choice (1-3, default=1): ")).strip()
+        await devin.run(_MODES.get(choice, "auto"))
             
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, EOFError):
         print("\n\n👋 Goodbye!")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop  # Optional libuv-based event loop, not available on Windows
+    except ImportError:
+        uvloop = None
+    
+    if uvloop is not None and sys.platform != "win32":
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
  
\ No newline at end of file
@@ -1,12 +1,23 @@
+import ast
 import logging
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import importlib.util
+import math
+import platform
+import re
+import secrets
+import string
+import threading
+import time
+from collections import OrderedDict
 from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
 from livekit.agents import function_tool, RunContext
-import requests
-from langchain_community.tools import DuckDuckGoSearchRun
+import aiohttp
+import psutil
+from duckduckgo_search import DDGS
 import asyncio
 from gemini_client import get_gemini_client, gemini_tool
 
@@ -14,38 +25,166 @@ from gemini_client import get_gemini_client, gemini_tool
 from devin_system import (
     grant_permission, revoke_permission, system_status_report,
     control_applications, file_operations, system_control,
-    intelligent_automation, network_diagnostics, voice_response_mode
+    intelligent_automation, network_diagnostics, voice_response_mode,
+    permission_manager
 )
 from screen_interaction import (
     take_screenshot, analyze_screen, mouse_control, keyboard_control,
     find_on_screen, window_management, clipboard_operations,
-    smart_automation_task
+    smart_automation_task, get_pixel_color, find_image_on_screen,
+    find_color_on_screen, define_screen_region, batch_input
 )
 from voice_interaction import (
     speak_text, listen_for_command, configure_voice,
-    voice_conversation_mode, audio_system_control, devin_wake_word_detection
+    voice_conversation_mode, audio_system_control, devin_wake_word_detection,
+    voice_manager
 )
 
 # Enhanced logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Characters calculate_math accepts, checked in one C-level pass before the
+# expression is parsed and vetted node by node in _compile_expr
+_SAFE_EXPR = re.compile(r"[0-9A-Za-z+\-*/%.(),\s]*")
+MATH_MAX_LENGTH = 200
+# A power needs a literal exponent no larger than this and a power-free base,
+# so an input like 9**9**9 is refused instead of tying up a CPU computing it
+MATH_MAX_EXPONENT = 100
+
+_MATH_SCOPE = {
+    "__builtins__": {},
+    "abs": abs,
+    "round": round,
+    "pow": pow,
+    "sqrt": math.sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "pi": math.pi,
+    "e": math.e
+}
+_MATH_NAMES = _MATH_SCOPE.keys() - {"__builtins__"}
+
+# Syntax a calculation may contain: arithmetic, numbers and calls of _MATH_SCOPE names
+_MATH_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+)
+
+def _is_power(node: ast.AST) -> bool:
+    return (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow)) or (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "pow"
+    )
+
+def _check_power(base: ast.AST, exponent: ast.AST):
+    """Reject powers whose result could be too large to compute quickly."""
+    if isinstance(exponent, ast.UnaryOp):
+        exponent = exponent.operand
+    if not (isinstance(exponent, ast.Constant) and abs(exponent.value) <= MATH_MAX_EXPONENT):
+        raise ValueError(f"exponents must be numbers no larger than {MATH_MAX_EXPONENT}")
+    if any(_is_power(node) for node in ast.walk(base)):
+        raise ValueError("powers of powers are not supported")
+
+@lru_cache(maxsize=256)
+def _compile_expr(expression: str):
+    """Vet and compile an expression once; repeated calculations reuse the code object.
+    
+    Raises ValueError for anything beyond arithmetic on numbers and _MATH_SCOPE names.
+    """
+    tree = ast.parse(expression, "<calc>", "eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _MATH_NODES):
+            raise ValueError(f"unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError("only numbers are supported")
+        if isinstance(node, ast.Name) and node.id not in _MATH_NAMES:
+            raise ValueError(f"unsupported name: {node.id}")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            _check_power(node.left, node.right)
+        elif _is_power(node) and len(node.args) >= 2:
+            _check_power(node.args[0], node.args[1])
+    return compile(tree, "<calc>", "eval")
+
+# Optional modules probed by initialize_devin: (label, module, pip package)
+CAPABILITY_MODULES = [
+    ("Screen Control", "pyautogui", "pyautogui"),
+    ("Computer Vision", "cv2", "opencv-python"),
+    ("Window Management", "pygetwindow", "pygetwindow"),
+    ("Clipboard Control", "pyperclip", "pyperclip"),
+]
+
+def _probe_capabilities() -> Dict[str, bool]:
+    """Locate each optional module once, without importing it."""
+    return {module: importlib.util.find_spec(module) is not None
+            for _, module, _ in CAPABILITY_MODULES}
+
+# Installed packages don't change while we run, so probe at import time
+_CAPS = _probe_capabilities()
+
+# Fixed parts of the initialize_devin report; only the checks in between vary
+_INIT_HEADER = "\n".join([
+    "🤖 DEVIN INITIALIZATION SEQUENCE",
+    "=" * 40,
+    "System Capabilities Check:",
+])
+_INIT_TAIL = "\n".join([
+    "",
+    "🎯 DEVIN Systems Status: ONLINE",
+    "Ready to assist, Sir. All core systems initialized.",
+    "",
+    "Available Commands:",
+    "• grant_permission - Enable system permissions",
+    "• system_status_report - Detailed system analysis",
+    "• speak_text - Voice synthesis",
+    "• voice_conversation_mode - Interactive voice chat",
+    "• take_screenshot - Screen capture",
+    "• analyze_screen - AI screen analysis",
+    "• control_applications - App management",
+    "• intelligent_automation - AI-guided automation",
+])
+
+# Fixed instructions for devin_command_center; only the command varies per call
+COMMAND_CENTER_INSTRUCTION = """As Devin, analyze the user's command and determine the best approach to execute it.
+
+Available capabilities:
+- System control (files, applications, processes)
+- Screen interaction (screenshots, mouse, keyboard)
+- Voice interaction (speech synthesis, recognition)
+- Network operations (diagnostics, connectivity)
+- Automation (intelligent task execution)
+- Window management
+- Audio control
+- Clipboard operations
+
+Provide:
+1. Command interpretation
+2. Required tools/functions to execute
+3. Step-by-step execution plan
+4. Any permissions needed
+5. Safety considerations
+
+Respond as Devin would - intelligent, helpful, and slightly witty."""
+
+# System prompts for creative_writing, keyed by writing type
+WRITING_PROMPTS = {
+    'story': "Write an engaging short story with a clear beginning, middle, and end. Include vivid descriptions and character development.",
+    'poem': "Write a creative poem with meaningful imagery and rhythm. Consider different poetic forms and styles.",
+    'article': "Write an informative article with a clear structure, engaging introduction, and valuable insights.",
+    'email': "Write a professional and clear email that effectively communicates the intended message.",
+    'summary': "Create a concise and comprehensive summary that captures the key points and main ideas.",
+}
+
 @function_tool
 async def initialize_devin(context: RunContext) -> str:
     """
     Initialize DEVIN-like capabilities and perform system checks.
     """
     try:
-        from devin_system import permission_manager
-        from voice_interaction import voice_manager
-        
-        # System initialization
+        # Only the capability and permission checks are built per call
         init_report = []
-        init_report.append("🤖 DEVIN INITIALIZATION SEQUENCE")
-        init_report.append("=" * 40)
-        
-        # Check system capabilities
-        init_report.append("System Capabilities Check:")
         
         # Voice system
         try:
@@ -57,60 +196,26 @@ async def initialize_devin(context: RunContext) -> str:
         except:
             init_report.append("  Voice Systems: ❌ (Install pyttsx3, speechrecognition)")
         
-        # Screen interaction
-        try:
-            import pyautogui
-            init_report.append("  Screen Control: ✅")
-        except ImportError:
-            init_report.append("  Screen Control: ❌ (Install pyautogui)")
-        
-        # Computer vision
-        try:
-            import cv2
-            init_report.append("  Computer Vision: ✅")
-        except ImportError:
-            init_report.append("  Computer Vision: ❌ (Install opencv-python)")
-        
-        # Window management
-        try:
-            import pygetwindow
-            init_report.append("  Window Management: ✅")
-        except ImportError:
-            init_report.append("  Window Management: ❌ (Install pygetwindow)")
-        
-        # Clipboard operations
-        try:
-            import pyperclip
-            init_report.append("  Clipboard Control: ✅")
-        except ImportError:
-            init_report.append("  Clipboard Control: ❌ (Install pyperclip)")
+        for label, module, package in CAPABILITY_MODULES:
+            if _CAPS[module]:
+                init_report.append(f"  {label}: ✅")
+            else:
+                init_report.append(f"  {label}: ❌ (Install {package})")
         
         init_report.append("")
         init_report.append("Permission Status:")
         for perm, status in permission_manager.permissions.items():
             init_report.append(f"  {perm.replace('_', ' ').title()}: {'✅' if status else '❌'}")
         
-        init_report.append("")
-        init_report.append("🎯 DEVIN Systems Status: ONLINE")
-        init_report.append("Ready to assist, Sir. All core systems initialized.")
-        init_report.append("")
-        init_report.append("Available Commands:")
-        init_report.append("• grant_permission - Enable system permissions")
-        init_report.append("• system_status_report - Detailed system analysis")
-        init_report.append("• speak_text - Voice synthesis")
-        init_report.append("• voice_conversation_mode - Interactive voice chat")
-        init_report.append("• take_screenshot - Screen capture")
-        init_report.append("• analyze_screen - AI screen analysis")
-        init_report.append("• control_applications - App management")
-        init_report.append("• intelligent_automation - AI-guided automation")
-        
-        # Try to speak the initialization if voice is available
+        # Announce without waiting: speak() only queues the line for the TTS
+        # worker, so the report returns while the greeting plays
         try:
-            voice_manager.speak("Devin systems online. All core functions initialized and ready, Sir.")
+            voice_manager.speak("Devin systems online. All core functions initialized and ready, Sir.",
+                                async_speak=True)
         except:
             pass
         
-        return "\n".join(init_report)
+        return "\n".join([_INIT_HEADER, *init_report, _INIT_TAIL])
         
     except Exception as e:
         logger.error(f"Devin initialization error: {e}")
@@ -128,31 +233,12 @@ async def devin_command_center(command: str, context: RunContext) -> str:
     try:
         client = get_gemini_client()
         
-        # Analyze the command and determine appropriate actions
-        analysis_prompt = f"""As Devin, analyze this command and determine the best approach to execute it:
-
-Command: {command}
-
-Available capabilities:
-- System control (files, applications, processes)
-- Screen interaction (screenshots, mouse, keyboard)
-- Voice interaction (speech synthesis, recognition)
-- Network operations (diagnostics, connectivity)
-- Automation (intelligent task execution)
-- Window management
-- Audio control
-- Clipboard operations
-
-Provide:
-1. Command interpretation
-2. Required tools/functions to execute
-3. Step-by-step execution plan
-4. Any permissions needed
-5. Safety considerations
-
-Respond as Devin would - intelligent, helpful, and slightly witty."""
+        # The static instructions travel as the model's system instruction
+        analysis_prompt = f"Command: {command}"
         
-        response = await client.generate_content(analysis_prompt)
+        response = await client.generate_content(
+            analysis_prompt, cache=True, system_instruction=COMMAND_CENTER_INSTRUCTION
+        )
         
         return f"""🤖 DEVIN Command Analysis
 
@@ -165,11 +251,43 @@ Would you like me to proceed with the recommended approach, or shall I wait for
         logger.error(f"Devin command center error: {e}")
         return f"Command analysis error: {str(e)}"
 
-# Cache for frequently accessed data
-@lru_cache(maxsize=100)
-def _cached_search(query: str) -> str:
-    """Cache search results to avoid repeated API calls."""
-    pass
+# DuckDuckGo rate-limits after a handful of queries, so repeated searches are
+# answered from here: (normalized query, max_results) -> (fetched_at, results)
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL = 600.0
+_search_cache: "OrderedDict[Tuple[str, int], Tuple[float, str]]" = OrderedDict()
+
+def _cached_search(key: Tuple[str, int], allow_stale: bool = False) -> Optional[str]:
+    """Return cached results for key if fresh (or at all, with allow_stale)."""
+    entry = _search_cache.get(key)
+    if entry is None:
+        return None
+    if not allow_stale and time.monotonic() - entry[0] >= SEARCH_CACHE_TTL:
+        return None
+    _search_cache.move_to_end(key)
+    return entry[1]
+
+def _store_search(key: Tuple[str, int], results: str):
+    _search_cache[key] = (time.monotonic(), results)
+    _search_cache.move_to_end(key)
+    if len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+# One DDGS client for the whole process so its HTTP session (and TLS
+# connection) is reused; the client is not thread-safe, hence the lock
+_ddgs: Optional[DDGS] = None
+_ddgs_lock = threading.Lock()
+
+def _ddg_text(query: str, max_results: int) -> List[Dict[str, str]]:
+    """Run a blocking DuckDuckGo text search on the shared client."""
+    global _ddgs
+    with _ddgs_lock:
+        if _ddgs is None:
+            _ddgs = DDGS()
+        return _ddgs.text(query, max_results=max_results) or []
+
+# Searches currently running, so concurrent identical queries share one request
+_search_inflight: Dict[Tuple[str, int], asyncio.Task] = {}
 
 @function_tool
 async def search_web(query: str, context: RunContext, max_results: int = 3) -> str:
@@ -181,20 +299,47 @@ async def search_web(query: str, context: RunContext, max_results: int = 3) -> s
         context: The run context
         max_results: Maximum number of results to return (default: 3)
     """
+    key = (" ".join(query.lower().split()), max_results)
+    cached = _cached_search(key)
+    if cached is not None:
+        return cached
+    
+    task = _search_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_search(key, query, max_results))
+        _search_inflight[key] = task
+        task.add_done_callback(lambda _: _search_inflight.pop(key, None))
+    # Shielded so one caller being cancelled does not abort the others' search
+    return await asyncio.shield(task)
+
+async def _search(key: Tuple[str, int], query: str, max_results: int) -> str:
+    """Fetch and format results for query, caching them under key."""
     try:
-        search_tool = DuckDuckGoSearchRun()
-        results = await search_tool.arun(tool_input=query)
+        hits = await asyncio.to_thread(_ddg_text, query, max_results)
         
-        if not results:
+        if not hits:
             logger.warning("No results found for query: %s", query)
             return "No results found for your search query."
         
-        # Format results better
-        formatted_results = f"Search results for '{query}':\n\n{results}"
-        return formatted_results[:2000]  # Limit response length
+        # Format results better, stopping once the response limit is reached
+        parts = [f"Search results for '{query}':\n\n"]
+        length = len(parts[0])
+        for i, hit in enumerate(hits, 1):
+            chunk = f"{i}. {hit.get('title', '')}\n{hit.get('body', '')}\n{hit.get('href', '')}\n\n"
+            parts.append(chunk)
+            length += len(chunk)
+            if length >= 2000:
+                break
+        formatted_results = "".join(parts).rstrip()[:2000]  # Limit response length
+        _store_search(key, formatted_results)
+        return formatted_results
         
     except Exception as e:
         logger.error("Error during web search: %s", e)
+        # Rate limited or offline: an expired answer beats none
+        stale = _cached_search(key, allow_stale=True)
+        if stale is not None:
+            return stale
         return f"Sorry, I encountered an error while searching: {str(e)}"
 
 @function_tool
@@ -202,8 +347,7 @@ async def get_current_time(context: RunContext) -> str:
     """
     Get the current date and time.
     """
-    current_time = datetime.now()
-    return f"Current date and time: {current_time.strftime('%Y-%m-%d %H:%M:%S')}"
+    return f"Current date and time: {datetime.now():{TIME_FORMAT}}"
 
 @function_tool
 async def calculate_math(expression: str, context: RunContext) -> str:
@@ -215,30 +359,39 @@ async def calculate_math(expression: str, context: RunContext) -> str:
     """
     try:
         # Basic safety: only allow certain characters
-        allowed_chars = set('0123456789+-*/.() ')
-        if not all(c in allowed_chars for c in expression.replace(' ', '')):
+        if len(expression) > MATH_MAX_LENGTH or not _SAFE_EXPR.fullmatch(expression):
             return "Error: Only basic mathematical operations are allowed."
         
-        # Use eval safely with limited scope
-        safe_dict = {
-            "__builtins__": {},
-            "abs": abs,
-            "round": round,
-            "pow": pow,
-            "sqrt": lambda x: x ** 0.5,
-            "sin": lambda x: __import__('math').sin(x),
-            "cos": lambda x: __import__('math').cos(x),
-            "tan": lambda x: __import__('math').tan(x),
-            "pi": 3.14159265359,
-            "e": 2.71828182846
-        }
+        try:
+            code = _compile_expr(expression)
+        except ValueError as e:
+            return f"Error: Only basic mathematical operations are allowed ({e})."
         
-        result = eval(expression, safe_dict, {})
+        # Use eval safely with limited scope; vetting bounds how long it can run
+        result = eval(code, _MATH_SCOPE, {})
         return f"Result: {result}"
         
     except Exception as e:
         return f"Error calculating expression: {str(e)}"
 
+# One pooled HTTP session shared by every tool, created on first use so it
+# binds to the running event loop
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=10)
+_http: Optional[aiohttp.ClientSession] = None
+
+def _http_session() -> aiohttp.ClientSession:
+    global _http
+    if _http is None or _http.closed:
+        _http = aiohttp.ClientSession(timeout=HTTP_TIMEOUT)
+    return _http
+
+async def close_http_session():
+    """Release the pooled connections; call on the loop that used them, at shutdown."""
+    global _http
+    if _http is not None and not _http.closed:
+        await _http.close()
+    _http = None
+
 @function_tool
 async def get_weather_info(location: str, context: RunContext) -> str:
     """
@@ -260,9 +413,9 @@ async def get_weather_info(location: str, context: RunContext) -> str:
             'units': 'metric'
         }
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        async with _http_session().get(url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
         
         weather_info = (
             f"Weather in {data['name']}, {data['sys']['country']}:\n"
@@ -274,13 +427,30 @@ async def get_weather_info(location: str, context: RunContext) -> str:
         
         return weather_info
         
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Failed to fetch weather data: %s", e)
         return f"Sorry, I couldn't fetch weather data for {location}. Please try again later."
     except Exception as e:
         logger.error("Error processing weather request: %s", e)
         return f"Error getting weather information: {str(e)}"
 
+# One JSON file per reminder in this directory
+REMINDERS_DIR = "reminders"
+
+def _save_reminder(reminder_data: Dict[str, str], created: datetime):
+    """Write one reminder to its own file, never overwriting an existing one."""
+    os.makedirs(REMINDERS_DIR, exist_ok=True)
+    stem = os.path.join(REMINDERS_DIR, f"reminder_{created:%Y%m%d_%H%M%S}")
+    suffix = 0
+    while True:
+        filepath = f"{stem}_{suffix}.json" if suffix else f"{stem}.json"
+        try:
+            with open(filepath, 'x') as f:
+                json.dump(reminder_data, f, indent=2)
+            return
+        except FileExistsError:
+            suffix += 1  # Another reminder was created in the same second
+
 @function_tool
 async def create_reminder(reminder_text: str, context: RunContext, minutes_from_now: int = 5) -> str:
     """
@@ -291,51 +461,52 @@ async def create_reminder(reminder_text: str, context: RunContext, minutes_from_
         minutes_from_now: When to remind (minutes from now)
     """
     try:
-        reminder_time = datetime.now() + timedelta(minutes=minutes_from_now)
-        
-        # Create reminders directory if it doesn't exist
-        reminders_dir = "reminders"
-        os.makedirs(reminders_dir, exist_ok=True)
+        # Read the clock once so created_at and remind_at agree
+        now = datetime.now()
+        reminder_time = now + timedelta(minutes=minutes_from_now)
         
         reminder_data = {
             "text": reminder_text,
-            "created_at": datetime.now().isoformat(),
+            "created_at": now.isoformat(),
             "remind_at": reminder_time.isoformat()
         }
         
-        # Save reminder to file
-        filename = f"reminder_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = os.path.join(reminders_dir, filename)
+        # Saved before confirming, with the file IO kept off the event loop
+        await asyncio.to_thread(_save_reminder, reminder_data, now)
         
-        with open(filepath, 'w') as f:
-            json.dump(reminder_data, f, indent=2)
-        
-        return f"Reminder created: '{reminder_text}' scheduled for {reminder_time.strftime('%Y-%m-%d %H:%M:%S')}"
+        return f"Reminder created: '{reminder_text}' scheduled for {reminder_time:{TIME_FORMAT}}"
         
     except Exception as e:
         logger.error("Error creating reminder: %s", e)
         return f"Sorry, I couldn't create the reminder: {str(e)}"
 
+# Fixed for the life of the process, so read once
+_PLATFORM_INFO = {
+    "OS": platform.system(),
+    "OS Version": platform.release(),
+    "Python Version": platform.python_version(),
+}
+_DISK_PATH = "C:" if _PLATFORM_INFO["OS"] == "Windows" else "/"
+psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU sampler
+
+def _read_system_info() -> str:
+    """Sample usage counters; disk_usage can stall on a slow or network mount."""
+    info = {
+        **_PLATFORM_INFO,
+        # Usage since the previous sample (or import), so no 1s blocking wait
+        "CPU Usage": f"{psutil.cpu_percent(interval=None):.1f}%",
+        "Memory Usage": f"{psutil.virtual_memory().percent:.1f}%",
+        "Disk Usage": f"{psutil.disk_usage(_DISK_PATH).percent:.1f}%"
+    }
+    return "System Information:\n" + "\n".join([f"{k}: {v}" for k, v in info.items()])
+
 @function_tool
 async def get_system_info(context: RunContext) -> str:
     """
     Get basic system information.
     """
     try:
-        import platform
-        import psutil
-        
-        info = {
-            "OS": platform.system(),
-            "OS Version": platform.release(),
-            "Python Version": platform.python_version(),
-            "CPU Usage": f"{psutil.cpu_percent(interval=1):.1f}%",
-            "Memory Usage": f"{psutil.virtual_memory().percent:.1f}%",
-            "Disk Usage": f"{psutil.disk_usage('/').percent:.1f}%" if platform.system() != "Windows" else f"{psutil.disk_usage('C:').percent:.1f}%"
-        }
-        
-        formatted_info = "System Information:\n" + "\n".join([f"{k}: {v}" for k, v in info.items()])
-        return formatted_info
+        return await asyncio.to_thread(_read_system_info)
         
     except Exception as e:
         return f"Could not retrieve system information: {str(e)}"
@@ -346,18 +517,19 @@ async def fetch_upi_apps() -> str:
     """
     url = "https://raw.githubusercontent.com/LiveKit/livekit-agents/main/agents/upi_apps.json"
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        async with _http_session().get(url) as response:
+            response.raise_for_status()
+            text = await response.text()
         
-        # Parse and format the JSON response
-        data = response.json()
+        # Parse and format the JSON response (served as text/plain)
+        data = json.loads(text)
         if isinstance(data, list):
             apps_list = "\n".join([f"- {app}" for app in data[:10]])  # Limit to first 10
             return f"Popular UPI Apps:\n{apps_list}"
         else:
-            return response.text
+            return text
             
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Failed to fetch UPI apps: %s", e)
         return "Error fetching UPI apps. Please try again later."
     except json.JSONDecodeError as e:
@@ -366,13 +538,14 @@ async def fetch_upi_apps() -> str:
 
 @function_tool
 @gemini_tool
-async def translate_text(text: str, target_language: str, context: RunContext) -> str:
+async def translate_text(text: str, target_language: str, context: RunContext, cache: bool = True) -> str:
     """
     Translate text using Google Gemini AI with enhanced accuracy.
     
     Args:
         text: Text to translate
         target_language: Target language (e.g., 'Spanish', 'French', 'German', 'Hindi')
+        cache: Reuse the answer to an identical recent request
     """
     if not text.strip():
         return "Error: No text provided for translation."
@@ -392,9 +565,25 @@ Rules:
 Text to translate:
 {text}"""
     
-    response = await client.generate_content(prompt)
+    response = await client.generate_content(prompt, cache=cache)
     return f"Translation to {target_language}:\n{response}"
 
+def _password_table(alphabet: str) -> Tuple[bytes, bytes]:
+    """Build a byte -> character table plus the bytes to reject.
+    
+    Bytes at or above the largest multiple of len(alphabet) are dropped so
+    every character is equally likely (no modulo bias).
+    """
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[b % len(alphabet)]) for b in range(256))
+    return table, bytes(range(limit, 256))
+
+# Keyed by include_symbols
+_PASSWORD_TABLES = {
+    False: _password_table(string.ascii_letters + string.digits),
+    True: _password_table(string.ascii_letters + string.digits + "!@#$%^&*"),
+}
+
 @function_tool
 async def generate_password(context: RunContext, length: int = 12, include_symbols: bool = True) -> str:
     """
@@ -405,15 +594,15 @@ async def generate_password(context: RunContext, length: int = 12, include_symbo
         include_symbols: Whether to include special symbols (default: True)
     """
     try:
-        import string
-        import secrets
+        table, reject = _PASSWORD_TABLES[bool(include_symbols)]
         
-        characters = string.ascii_letters + string.digits
-        if include_symbols:
-            characters += "!@#$%^&*"
+        # One bulk draw mapped through a byte table; over-sampled because
+        # rejected bytes are dropped, topped up in the rare short case
+        password = b""
+        while len(password) < length:
+            password += secrets.token_bytes(length * 2).translate(table, reject)
         
-        password = ''.join(secrets.choice(characters) for _ in range(length))
-        return f"Generated secure password: {password}"
+        return f"Generated secure password: {password[:length].decode('ascii')}"
         
     except Exception as e:
         return f"Error generating password: {str(e)}"
@@ -459,6 +648,15 @@ async def manage_memory(action: str, content: str = "", context: RunContext = No
     except Exception as e:
         return f"Memory management error: {str(e)}"
 
+@lru_cache(maxsize=1024)
+def _short_hash(url: str) -> str:
+    """48-bit fingerprint of url as 8 URL-safe characters."""
+    import hashlib
+    import base64
+    
+    digest = hashlib.blake2b(url.encode(), digest_size=6).digest()
+    return base64.urlsafe_b64encode(digest).decode()
+
 @function_tool
 async def url_shortener(long_url: str, context: RunContext) -> str:
     """
@@ -470,12 +668,7 @@ async def url_shortener(long_url: str, context: RunContext) -> str:
     try:
         # Using a simple URL shortener service
         # This is a placeholder - you'd want to use a proper service like bit.ly
-        import hashlib
-        import base64
-        
-        # Create a simple hash-based short URL
-        hash_object = hashlib.md5(long_url.encode())
-        short_hash = base64.urlsafe_b64encode(hash_object.digest())[:8].decode()
+        short_hash = _short_hash(long_url)
         
         return f"Shortened URL: https://short.ly/{short_hash} (Original: {long_url})"
         
@@ -498,6 +691,31 @@ async def qr_code_generator(text: str, context: RunContext) -> str:
     except Exception as e:
         return f"Error generating QR code: {str(e)}"
 
+def _analyze_text(text: str) -> str:
+    """Count characters, words, sentences and paragraphs in text."""
+    words = text.split()
+    sentences = text.split('.')
+    paragraphs = text.split('\n\n')
+    
+    analysis = {
+        "Characters": len(text),
+        "Characters (no spaces)": len(text.replace(' ', '')),
+        "Words": len(words),
+        "Sentences": len([s for s in sentences if s.strip()]),
+        "Paragraphs": len([p for p in paragraphs if p.strip()]),
+        "Average words per sentence": round(len(words) / max(len(sentences), 1), 2),
+        "Reading time (approx)": f"{len(words) // 200 + 1} minutes"
+    }
+    
+    result = "Text Analysis:\n"
+    for key, value in analysis.items():
+        result += f"{key}: {value}\n"
+    
+    return result
+
+# Below this many characters the thread hop costs more than the analysis
+TEXT_ANALYSIS_INLINE_LIMIT = 10_000
+
 @function_tool
 async def text_analyzer(text: str, context: RunContext) -> str:
     """
@@ -507,37 +725,22 @@ async def text_analyzer(text: str, context: RunContext) -> str:
         text: Text to analyze
     """
     try:
-        words = text.split()
-        sentences = text.split('.')
-        paragraphs = text.split('\n\n')
-        
-        analysis = {
-            "Characters": len(text),
-            "Characters (no spaces)": len(text.replace(' ', '')),
-            "Words": len(words),
-            "Sentences": len([s for s in sentences if s.strip()]),
-            "Paragraphs": len([p for p in paragraphs if p.strip()]),
-            "Average words per sentence": round(len(words) / max(len(sentences), 1), 2),
-            "Reading time (approx)": f"{len(words) // 200 + 1} minutes"
-        }
-        
-        result = "Text Analysis:\n"
-        for key, value in analysis.items():
-            result += f"{key}: {value}\n"
-        
-        return result
+        if len(text) < TEXT_ANALYSIS_INLINE_LIMIT:
+            return _analyze_text(text)
+        return await asyncio.to_thread(_analyze_text, text)
         
     except Exception as e:
         return f"Error analyzing text: {str(e)}"
 
 @function_tool
 @gemini_tool
-async def ai_assistant(query: str, context: RunContext) -> str:
+async def ai_assistant(query: str, context: RunContext, cache: bool = True) -> str:
     """
     Advanced AI assistance using Google Gemini for complex queries and analysis.
     
     Args:
         query: Complex question or task that requires advanced AI reasoning
+        cache: Reuse the answer to an identical recent request
     """
     if not query.strip():
         return "Error: No query provided."
@@ -559,9 +762,18 @@ Guidelines:
 
 Query: {query}"""
     
-    response = await client.generate_content(enhanced_prompt)
+    response = await client.generate_content(enhanced_prompt, cache=cache)
     return f"AI Analysis:\n{response}"
 
+@lru_cache(maxsize=1)
+def _genai_model(api_key: str):
+    """Configure the SDK and build the shared model once per key; each
+    configure() call discards the SDK's cached clients, and with them the
+    open channel to the API."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash')
+
 @function_tool
 async def code_analyzer(code: str, language: str, context: RunContext) -> str:
     """
@@ -572,14 +784,11 @@ async def code_analyzer(code: str, language: str, context: RunContext) -> str:
         language: Programming language (e.g., 'python', 'javascript', 'java')
     """
     try:
-        import google.generativeai as genai
-        
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             return "Code analysis service not configured. Please set GOOGLE_API_KEY environment variable."
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        model = _genai_model(api_key)
         
         prompt = f"""Analyze this {language} code for:
 1. Potential bugs or errors
@@ -595,7 +804,7 @@ Code:
 
 Provide a structured analysis with specific recommendations."""
         
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         return f"Code Analysis Results:\n{response.text}"
         
     except Exception as e:
@@ -612,14 +821,11 @@ async def explain_concept(concept: str, context: RunContext, complexity: str = "
         complexity: Explanation level ('beginner', 'intermediate', 'advanced')
     """
     try:
-        import google.generativeai as genai
-        
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             return "Concept explanation service not configured. Please set GOOGLE_API_KEY environment variable."
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        model = _genai_model(api_key)
         
         prompt = f"""Explain the concept of "{concept}" at a {complexity} level.
 
@@ -637,7 +843,7 @@ Structure the explanation with:
 
 Concept: {concept}"""
         
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         return f"Concept Explanation ({complexity} level):\n{response.text}"
         
     except Exception as e:
@@ -654,31 +860,20 @@ async def creative_writing(prompt_text: str, writing_type: str, context: RunCont
         writing_type: Type of content ('story', 'poem', 'article', 'email', 'summary')
     """
     try:
-        import google.generativeai as genai
-        
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             return "Creative writing service not configured. Please set GOOGLE_API_KEY environment variable."
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        if writing_type.lower() == 'story':
-            system_prompt = "Write an engaging short story with a clear beginning, middle, and end. Include vivid descriptions and character development."
-        elif writing_type.lower() == 'poem':
-            system_prompt = "Write a creative poem with meaningful imagery and rhythm. Consider different poetic forms and styles."
-        elif writing_type.lower() == 'article':
-            system_prompt = "Write an informative article with a clear structure, engaging introduction, and valuable insights."
-        elif writing_type.lower() == 'email':
-            system_prompt = "Write a professional and clear email that effectively communicates the intended message."
-        elif writing_type.lower() == 'summary':
-            system_prompt = "Create a concise and comprehensive summary that captures the key points and main ideas."
-        else:
-            system_prompt = f"Create high-quality {writing_type} content that is engaging and well-structured."
+        model = _genai_model(api_key)
+        
+        system_prompt = WRITING_PROMPTS.get(
+            writing_type.lower(),
+            f"Create high-quality {writing_type} content that is engaging and well-structured."
+        )
         
         full_prompt = f"{system_prompt}\n\nTopic/Prompt: {prompt_text}"
         
-        response = model.generate_content(full_prompt)
+        response = await model.generate_content_async(full_prompt)
         return f"Generated {writing_type.title()}:\n\n{response.text}"
         
     except Exception as e:
@@ -694,14 +889,11 @@ async def data_insights(data_description: str, context: RunContext) -> str:
         data_description: Description of the data or actual data to analyze
     """
     try:
-        import google.generativeai as genai
-        
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             return "Data insights service not configured. Please set GOOGLE_API_KEY environment variable."
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        model = _genai_model(api_key)
         
         prompt = f"""Analyze the following data and provide insights:
 
@@ -717,7 +909,7 @@ Please provide:
 
 Be specific and practical in your analysis."""
         
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         return f"Data Insights:\n{response.text}"
         
     except Exception as e:
@@ -3,11 +3,15 @@ Voice and audio interaction capabilities for DEVIN-like functionality.
 """
 import speech_recognition as sr
 import pyttsx3
+import numpy as np
+import asyncio
+import queue
+import re
 import threading
 import time
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import os
 from livekit.agents import function_tool, RunContext
@@ -25,20 +29,58 @@ if OFFLINE:
 
 logger = logging.getLogger(__name__)
 
+# Cap on a single online recognition request, so a network stall can't hang listen()
+RECOGNITION_TIMEOUT = float(os.getenv("VOICE_RECOGNITION_TIMEOUT", "10"))
+
+# Ambient noise sample taken before the first listen
+CALIBRATION_SECONDS = float(os.getenv("VOICE_CALIBRATION_SECONDS", "0.3"))
+
+# Speech gate applied before recognition: at least this many 10 ms frames
+# must be louder than the recognizer's energy threshold (~100 ms of speech)
+GATE_FRAME_SECONDS = 0.01
+GATE_MIN_VOICED_FRAMES = 10
+
+def _voiced_frames(raw: bytes, sample_rate: int, sample_width: int, threshold: float) -> int:
+    """Count 10 ms frames of 16-bit PCM whose RMS energy exceeds threshold."""
+    if sample_width != 2:
+        return GATE_MIN_VOICED_FRAMES  # Only 16-bit audio is gated
+    
+    samples = np.frombuffer(raw, dtype=np.int16)
+    frame = max(1, int(sample_rate * GATE_FRAME_SECONDS))
+    count = len(samples) // frame
+    if count == 0:
+        return 0
+    
+    # Per-frame mean square in one vectorized pass
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float32)
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+    return int(np.count_nonzero(rms > threshold))
+
+# Phrases that end voice_conversation_mode, matched as whole words in one pass
+_EXIT_PHRASES_RE = re.compile(r"\b(?:goodbye|exit|stop|end conversation)\b", re.IGNORECASE)
+
 class VoiceManager:
     """Manages voice synthesis and recognition."""
     
+    __slots__ = ("tts_engine", "recognizer", "microphone", "rate", "volume",
+                 "voice_id", "voices", "_tts_queue", "_calibrated")
+    
     def __init__(self):
         self.tts_engine = None
         self.recognizer = None
         self.microphone = None
-        self.voice_settings = {
-            "rate": 180,
-            "volume": 0.8,
-            "voice_id": 0  # 0 for male, 1 for female (if available)
-        }
+        self.rate = 180
+        self.volume = 0.8
+        self.voice_id = 0  # 0 for male, 1 for female (if available)
+        self.voices = []  # Installed voices, read once from the engine
+        self._calibrated = False
+        # pyttsx3 engines are not reentrant, so one daemon worker drains a queue
+        # of (text, done_event) utterances; daemon so a stuck engine can't block exit
+        self._tts_queue: "queue.Queue[Tuple[str, Optional[threading.Event]]]" = queue.Queue()
         self.initialize_tts()
         self.initialize_speech_recognition()
+        if self.tts_engine:
+            threading.Thread(target=self._tts_worker, name="voice-tts", daemon=True).start()
     
     def initialize_tts(self):
         """Initialize text-to-speech engine."""
@@ -46,12 +88,12 @@ class VoiceManager:
             self.tts_engine = pyttsx3.init()
             
             # Set voice properties
-            voices = self.tts_engine.getProperty('voices')
-            if voices and len(voices) > self.voice_settings["voice_id"]:
-                self.tts_engine.setProperty('voice', voices[self.voice_settings["voice_id"]].id)
+            self.voices = self.tts_engine.getProperty('voices') or []
+            if len(self.voices) > self.voice_id:
+                self.tts_engine.setProperty('voice', self.voices[self.voice_id].id)
             
-            self.tts_engine.setProperty('rate', self.voice_settings["rate"])
-            self.tts_engine.setProperty('volume', self.voice_settings["volume"])
+            self.tts_engine.setProperty('rate', self.rate)
+            self.tts_engine.setProperty('volume', self.volume)
             
         except Exception as e:
             logger.error(f"TTS initialization error: {e}")
@@ -59,13 +101,11 @@ class VoiceManager:
     def initialize_speech_recognition(self):
         """Initialize speech recognition."""
         try:
+            # Ambient noise calibration happens on the first listen(), so
+            # importing this module doesn't block on the microphone
             self.recognizer = sr.Recognizer()
+            self.recognizer.operation_timeout = RECOGNITION_TIMEOUT
             self.microphone = sr.Microphone()
-            
-            # Adjust for ambient noise
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                
         except Exception as e:
             logger.error(f"Speech recognition initialization error: {e}")
     
@@ -75,21 +115,44 @@ class VoiceManager:
             return False
         
         try:
-            if async_speak:
-                # Speak in a separate thread to avoid blocking
-                threading.Thread(target=self._speak_sync, args=(text,), daemon=True).start()
-            else:
-                self._speak_sync(text)
+            done = None if async_speak else threading.Event()
+            self._tts_queue.put((text, done))
+            if done is not None:
+                done.wait()
             return True
         except Exception as e:
             logger.error(f"TTS error: {e}")
             return False
     
+    def _tts_worker(self):
+        """Speak queued utterances one at a time."""
+        while True:
+            text, done = self._tts_queue.get()
+            try:
+                self._speak_sync(text)
+            except Exception as e:
+                logger.error(f"TTS error: {e}")
+            finally:
+                if done is not None:
+                    done.set()
+                self._tts_queue.task_done()
+    
+    def wait_until_idle(self):
+        """Block until every queued utterance has been spoken."""
+        if self.tts_engine:
+            self._tts_queue.join()
+    
     def _speak_sync(self, text: str):
         """Synchronous speech function."""
         self.tts_engine.say(text)
         self.tts_engine.runAndWait()
     
+    @staticmethod
+    def _mic_chunks(source, max_seconds: float):
+        """Yield raw PCM chunks from an open microphone for up to max_seconds."""
+        for _ in range(int(max_seconds * source.SAMPLE_RATE / source.CHUNK)):
+            yield source.stream.read(source.CHUNK)
+    
     def listen(self, timeout: int = 5, phrase_time_limit: int = 10) -> Optional[str]:
         """Listen for speech input."""
         if not self.recognizer or not self.microphone:
@@ -97,30 +160,29 @@ class VoiceManager:
         
         try:
             with self.microphone as source:
+                if not self._calibrated:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=CALIBRATION_SECONDS)
+                    self._calibrated = True
+                
+                # Prefer offline STT if configured; it decodes while we capture
+                # and its endpointer ends the turn, so there is no record-then-
+                # transcribe wait once the user stops talking
+                if _offline_stt is not None:
+                    try:
+                        chunks = self._mic_chunks(source, timeout + phrase_time_limit)
+                        return _offline_stt.recognize_stream(chunks, source.SAMPLE_RATE) or "unclear"
+                    except Exception as e:
+                        logger.error(f"Offline STT failed, falling back to online: {e}")
+                
                 # Listen for audio
                 audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
             
-            # Prefer offline STT if configured
-            if _offline_stt is not None:
-                try:
-                    import tempfile, wave
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tf:
-                        wav_path = tf.name
-                    # Save audio to WAV for Vosk
-                    data = audio.get_wav_data()
-                    with wave.open(wav_path, 'wb') as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)
-                        wf.setframerate(16000)
-                        wf.writeframes(data)
-                    text = _offline_stt.recognize_wav_file(wav_path) or ""
-                    try:
-                        os.remove(wav_path)
-                    except Exception:
-                        pass
-                    return text
-                except Exception as e:
-                    logger.error(f"Offline STT failed, falling back to online: {e}")
+            # Clicks and bumps can trip the recognizer's start threshold; don't
+            # spend a recognition round-trip on audio with almost no speech in it
+            voiced = _voiced_frames(audio.get_raw_data(), audio.sample_rate,
+                                    audio.sample_width, self.recognizer.energy_threshold)
+            if voiced < GATE_MIN_VOICED_FRAMES:
+                return "unclear"
             
             # Fallback: Google's service (may require internet)
             try:
@@ -151,7 +213,11 @@ async def speak_text(text: str, context: RunContext, async_speak: bool = True) -
         async_speak: Whether to speak asynchronously (non-blocking)
     """
     try:
-        success = voice_manager.speak(text, async_speak)
+        if async_speak:
+            success = voice_manager.speak(text)
+        else:
+            # Waiting for the utterance to finish must not stall the event loop
+            success = await asyncio.to_thread(voice_manager.speak, text, False)
         
         if success:
             return f"🔊 Speaking: {text[:100]}{'...' if len(text) > 100 else ''}"
@@ -171,11 +237,13 @@ async def listen_for_command(context: RunContext, timeout: int = 10) -> str:
         timeout: Maximum time to wait for input (seconds)
     """
     try:
-        # Speak prompt
-        voice_manager.speak("Yes, Sir? I'm listening.", async_speak=False)
+        # Speak prompt; this waits for any queued speech, so the microphone
+        # only opens once Devin is silent (half-duplex: nothing cancels the
+        # speaker's echo, so listening during playback would hear ourselves)
+        await asyncio.to_thread(voice_manager.speak, "Yes, Sir? I'm listening.", False)
         
-        # Listen for command
-        result = voice_manager.listen(timeout=timeout)
+        # Listen for command off the event loop
+        result = await asyncio.to_thread(voice_manager.listen, timeout)
         
         if result == "timeout":
             return "⏱️ No voice input detected within timeout period."
@@ -204,7 +272,7 @@ async def configure_voice(setting: str, value: str, context: RunContext) -> str:
             # Speech rate (words per minute)
             rate = int(value)
             if 50 <= rate <= 300:
-                voice_manager.voice_settings["rate"] = rate
+                voice_manager.rate = rate
                 voice_manager.tts_engine.setProperty('rate', rate)
                 voice_manager.speak(f"Speech rate set to {rate} words per minute, Sir.")
                 return f"✅ Speech rate set to {rate} WPM"
@@ -215,7 +283,7 @@ async def configure_voice(setting: str, value: str, context: RunContext) -> str:
             # Volume level (0.0 to 1.0)
             volume = float(value)
             if 0.0 <= volume <= 1.0:
-                voice_manager.voice_settings["volume"] = volume
+                voice_manager.volume = volume
                 voice_manager.tts_engine.setProperty('volume', volume)
                 voice_manager.speak(f"Volume set to {int(volume*100)} percent, Sir.")
                 return f"✅ Volume set to {int(volume*100)}%"
@@ -225,10 +293,10 @@ async def configure_voice(setting: str, value: str, context: RunContext) -> str:
         elif setting == "voice":
             # Voice selection (0 for male, 1 for female if available)
             voice_id = int(value)
-            voices = voice_manager.tts_engine.getProperty('voices')
+            voices = voice_manager.voices
             
             if voices and 0 <= voice_id < len(voices):
-                voice_manager.voice_settings["voice_id"] = voice_id
+                voice_manager.voice_id = voice_id
                 voice_manager.tts_engine.setProperty('voice', voices[voice_id].id)
                 voice_manager.speak("Voice updated, Sir. How do I sound now?")
                 return f"✅ Voice changed to option {voice_id}"
@@ -243,15 +311,11 @@ async def configure_voice(setting: str, value: str, context: RunContext) -> str:
         
         elif setting == "info":
             # Get current voice information
-            current_settings = voice_manager.voice_settings
-            voices = voice_manager.tts_engine.getProperty('voices')
-            voice_count = len(voices) if voices else 0
-            
             info = f"""🎙️ Current Voice Settings:
-- Rate: {current_settings['rate']} WPM
-- Volume: {int(current_settings['volume']*100)}%
-- Voice ID: {current_settings['voice_id']}
-- Available Voices: {voice_count}"""
+- Rate: {voice_manager.rate} WPM
+- Volume: {int(voice_manager.volume*100)}%
+- Voice ID: {voice_manager.voice_id}
+- Available Voices: {len(voice_manager.voices)}"""
             
             return info
         
@@ -284,8 +348,8 @@ async def voice_conversation_mode(context: RunContext, duration: int = 60) -> st
         
         while time.time() - start_time < duration:
             # Listen for user input
-            voice_manager.speak("Listening...")
-            user_input = voice_manager.listen(timeout=10)
+            await asyncio.to_thread(voice_manager.speak, "Listening...", False)
+            user_input = await asyncio.to_thread(voice_manager.listen, 10)
             
             if user_input == "timeout":
                 voice_manager.speak("I'm still here if you need anything, Sir.")
@@ -299,7 +363,7 @@ async def voice_conversation_mode(context: RunContext, duration: int = 60) -> st
             conversation_log.append(f"User: {user_input}")
             
             # Check for exit commands
-            if any(phrase in user_input.lower() for phrase in ["goodbye", "exit", "stop", "end conversation"]):
+            if _EXIT_PHRASES_RE.search(user_input):
                 farewell = "Until next time, Sir. It's been a pleasure."
                 voice_manager.speak(farewell)
                 conversation_log.append(f"Devin: {farewell}")
@@ -365,30 +429,30 @@ async def audio_system_control(action: str, context: RunContext, level: int = 50
         
         if action == "volume_up":
             if system == "Windows":
-                os.system("nircmd.exe changesysvolume 6553")
+                await asyncio.to_thread(os.system, "nircmd.exe changesysvolume 6553")
             else:
-                os.system("amixer -D pulse sset Master 10%+")
+                await asyncio.to_thread(os.system, "amixer -D pulse sset Master 10%+")
             return "🔊 Volume increased"
         
         elif action == "volume_down":
             if system == "Windows":
-                os.system("nircmd.exe changesysvolume -6553")
+                await asyncio.to_thread(os.system, "nircmd.exe changesysvolume -6553")
             else:
-                os.system("amixer -D pulse sset Master 10%-")
+                await asyncio.to_thread(os.system, "amixer -D pulse sset Master 10%-")
             return "🔉 Volume decreased"
         
         elif action == "mute":
             if system == "Windows":
-                os.system("nircmd.exe mutesysvolume 1")
+                await asyncio.to_thread(os.system, "nircmd.exe mutesysvolume 1")
             else:
-                os.system("amixer -D pulse sset Master mute")
+                await asyncio.to_thread(os.system, "amixer -D pulse sset Master mute")
             return "🔇 Audio muted"
         
         elif action == "unmute":
             if system == "Windows":
-                os.system("nircmd.exe mutesysvolume 0")
+                await asyncio.to_thread(os.system, "nircmd.exe mutesysvolume 0")
             else:
-                os.system("amixer -D pulse sset Master unmute")
+                await asyncio.to_thread(os.system, "amixer -D pulse sset Master unmute")
             return "🔊 Audio unmuted"
         
         elif action == "set_volume":
@@ -396,9 +460,9 @@ async def audio_system_control(action: str, context: RunContext, level: int = 50
                 if system == "Windows":
                     # Calculate volume for Windows (0-65535)
                     win_volume = int((level / 100) * 65535)
-                    os.system(f"nircmd.exe setsysvolume {win_volume}")
+                    await asyncio.to_thread(os.system, f"nircmd.exe setsysvolume {win_volume}")
                 else:
-                    os.system(f"amixer -D pulse sset Master {level}%")
+                    await asyncio.to_thread(os.system, f"amixer -D pulse sset Master {level}%")
                 return f"🔊 Volume set to {level}%"
             else:
                 return "❌ Volume level must be between 0 and 100"
@@ -8,7 +8,7 @@ from fastapi.responses import HTMLResponse, FileResponse
 import asyncio
 import json
 import logging
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 import uvicorn
 
 # Import your existing modules
@@ -22,6 +22,13 @@ logger = logging.getLogger(__name__)
 # Store active WebSocket connections
 active_connections: List[WebSocket] = []
 
+# Fixed text around the user's message; only the message itself varies
+_MESSAGE_PROMPT_HEAD = "As Devin, a helpful AI assistant, respond to this message:\n\nUser: "
+_MESSAGE_PROMPT_TAIL = (
+    "\n\nProvide a helpful, intelligent response as Devin would.\n"
+    "Be concise but thorough."
+)
+
 class WebDevin:
     """Web-based Devin AI Assistant."""
     
@@ -32,14 +39,7 @@ class WebDevin:
         """Process user message and return response."""
         try:
             # Use Gemini to process the request
-            prompt = f"""
-            As Devin, a helpful AI assistant, respond to this message:
-            
-            User: {message}
-            
-            Provide a helpful, intelligent response as Devin would.
-            Be concise but thorough.
-            """
+            prompt = _MESSAGE_PROMPT_HEAD + message + _MESSAGE_PROMPT_TAIL
             
             response = await self.gemini_client.generate_content(prompt)
             
@@ -57,12 +57,28 @@ class WebDevin:
                 "timestamp": asyncio.get_event_loop().time()
             }
 
+    async def process_message_stream(self, message: str) -> AsyncIterator[Dict]:
+        """Process user message, yielding the response as it is generated."""
+        try:
+            prompt = _MESSAGE_PROMPT_HEAD + message + _MESSAGE_PROMPT_TAIL
+            
+            async for chunk in self.gemini_client.generate_content_stream(prompt):
+                yield {"type": "chunk", "message": chunk}
+            
+            yield {"type": "end", "timestamp": asyncio.get_event_loop().time()}
+            
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            yield {
+                "type": "error",
+                "message": f"Sorry, I encountered an error: {str(e)}",
+                "timestamp": asyncio.get_event_loop().time()
+            }
+
 web_devin = WebDevin()
 
-@app.get("/")
-async def get_homepage():
-    """Serve the main web interface."""
-    return HTMLResponse(content="""
+# The page is static, so it is encoded once here rather than per request
+_HOMEPAGE_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -115,9 +131,23 @@ async def get_homepage():
                 status.style.color = "#00cc00";
             };
 
+            // Streamed replies arrive as "chunk" messages appended to one bubble
+            let streaming = null;
+
             ws.onmessage = function(event) {
                 const data = JSON.parse(event.data);
-                addMessage(data.message, "devin-message");
+                if (data.type === "chunk") {
+                    if (!streaming) {
+                        streaming = addMessage("", "devin-message");
+                    }
+                    streaming.textContent += data.message;
+                    chatContainer.scrollTop = chatContainer.scrollHeight;
+                } else if (data.type === "end") {
+                    streaming = null;
+                } else {
+                    streaming = null;
+                    addMessage(data.message, "devin-message");
+                }
             };
 
             ws.onclose = function(event) {
@@ -131,6 +161,7 @@ async def get_homepage():
                 messageDiv.textContent = message;
                 chatContainer.appendChild(messageDiv);
                 chatContainer.scrollTop = chatContainer.scrollHeight;
+                return messageDiv;
             }
 
             function sendMessage() {
@@ -151,7 +182,12 @@ async def get_homepage():
         </script>
     </body>
     </html>
-    """)
+    """.encode("utf-8")
+
+@app.get("/")
+async def get_homepage():
+    """Serve the main web interface."""
+    return HTMLResponse(content=_HOMEPAGE_HTML)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -166,11 +202,9 @@ async def websocket_endpoint(websocket: WebSocket):
             message_data = json.loads(data)
             
             if message_data["type"] == "message":
-                # Process the message
-                response = await web_devin.process_message(message_data["content"])
-                
-                # Send response back to client
-                await websocket.send_text(json.dumps(response))
+                # Relay the response to the client chunk by chunk as it is generated
+                async for response in web_devin.process_message_stream(message_data["content"]):
+                    await websocket.send_text(json.dumps(response))
                 
     except WebSocketDisconnect:
         active_connections.remove(websocket)